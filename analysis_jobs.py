@@ -0,0 +1,76 @@
+import os
+import time
+import asyncio
+import logging
+import metrics
+
+ANALYSIS_JOBS_PER_USER = int(os.getenv("ANALYSIS_JOBS_PER_USER", "1"))
+
+JOBS = metrics.Counter("quizzy_analysis_jobs_total", "Text analysis jobs by outcome", ["outcome"])
+WASTED_SECONDS = metrics.Counter(
+    "quizzy_analysis_wasted_seconds_total", "Time spent on analysis jobs whose result was thrown away", ["outcome"]
+)
+
+
+class AnalysisJobs:
+    # Аналіз тексту йде фоновою задачею, тож обробник оновлення одразу звільняє чергу чату,
+    # а кнопки можуть скасувати роботу. Задача повертає False, якщо результат уже нікому не потрібен
+    def __init__(self, per_user=ANALYSIS_JOBS_PER_USER):
+        self.per_user = per_user
+        self._jobs = {}
+
+    def __len__(self):
+        return sum(len(tasks) for tasks in self._jobs.values())
+
+    def start(self, chat_id, job, *args):
+        tasks = self._jobs.setdefault(chat_id, set())
+        if len(tasks) >= self.per_user:
+            JOBS.inc("rejected")
+            return None
+        task = asyncio.create_task(self._run(job, *args))
+        tasks.add(task)
+        task.add_done_callback(lambda _: self._forget(chat_id, task))
+        return task
+
+    def _forget(self, chat_id, task):
+        tasks = self._jobs.get(chat_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._jobs[chat_id]
+
+    async def _run(self, job, *args):
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            outcome = "done" if await job(*args) is not False else "discarded"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            logging.error(f"Analysis job failed: {e!r}")
+        finally:
+            JOBS.inc(outcome)
+            if outcome != "done":
+                WASTED_SECONDS.inc(outcome, amount=time.perf_counter() - started)
+
+    def cancel(self, chat_id):
+        tasks = self._jobs.get(chat_id, ())
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    async def wait(self, chat_id):
+        tasks = list(self._jobs.get(chat_id, ()))
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def stop(self):
+        tasks = [task for tasks in self._jobs.values() for task in tasks]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+analysis_jobs = AnalysisJobs()
@@ -0,0 +1,168 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from metrics import track
+from nlp_models import DEFAULT_LANGUAGE, supported_language
+from nlp_pool import NLPBusyError, detect_language, extract_words
+from translations import translate_words
+
+ARTICLE_POOL_SIZE = int(os.getenv("ARTICLE_POOL_SIZE", "10"))
+ARTICLE_CORPUS = os.getenv("ARTICLE_CORPUS")
+ARTICLE_MIN_LENGTH = 50
+ON_DEMAND_ATTEMPTS = 3
+# Після кожної непридатної статті пауза подвоюється, щоб не засипати Wikipedia запитами
+ARTICLE_RETRY_DELAY = float(os.getenv("ARTICLE_RETRY_DELAY", "0.5"))
+ARTICLE_RETRY_MAX_DELAY = float(os.getenv("ARTICLE_RETRY_MAX_DELAY", "60"))
+
+
+# wikipedia.set_lang змінює глобальний стан бібліотеки, тому пули різних мов читають по черзі
+_wikipedia_lock = threading.Lock()
+
+
+class SkipArticle(Exception):
+    pass
+
+
+class ArticlePool:
+    # Фоновий продюсер тримає чергу статей, для яких уже визначено мову,
+    # знайдено ключові слова й підготовано переклади
+    def __init__(self, size=ARTICLE_POOL_SIZE, corpus_path=ARTICLE_CORPUS, language=DEFAULT_LANGUAGE):
+        self.language = language
+        self.corpus_path = corpus_path
+        self._queue = asyncio.Queue(maxsize=size)
+        self._corpus = None
+        # Корпус читають з потоків і продюсер, і get(), а спільний файловий об'єкт не потокобезпечний
+        self._corpus_lock = threading.Lock()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._produce())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Скасування не зупиняє потік, що вже читає корпус, тож закриваємо файл під тим самим lock
+        with self._corpus_lock:
+            if self._corpus is not None:
+                self._corpus.close()
+                self._corpus = None
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def _read_corpus(self):
+        # JSONL з полями title і text; по досягненню кінця файлу починаємо спочатку
+        with self._corpus_lock:
+            if self._corpus is None:
+                self._corpus = open(self.corpus_path, encoding="utf-8")
+            for _ in range(2):
+                line = self._corpus.readline()
+                if not line:
+                    self._corpus.seek(0)
+                    continue
+                if line.strip():
+                    item = json.loads(line)
+                    return item.get("title", ""), item["text"]
+        raise ValueError(f"Corpus {self.corpus_path} is empty")
+
+    def _read_wikipedia(self):
+        import wikipedia
+
+        try:
+            with _wikipedia_lock:
+                wikipedia.set_lang(self.language)
+                title = wikipedia.random(1)
+                page = wikipedia.page(title, auto_suggest=False)
+        except wikipedia.exceptions.WikipediaException as e:
+            raise SkipArticle(str(e)) from e
+        return page.title, page.content
+
+    async def _fetch_candidate(self):
+        if self.corpus_path:
+            return await asyncio.to_thread(self._read_corpus)
+        with track("wikipedia"):
+            return await asyncio.to_thread(self._read_wikipedia)
+
+    async def _prepare(self, title, text):
+        if not text or len(text) < ARTICLE_MIN_LENGTH:
+            return None
+        if await detect_language(text) != self.language:
+            return None
+        words = await extract_words(text, self.language)
+        if not words:
+            return None
+        translations = await translate_words(words, source_lang=self.language)
+        return {"title": title, "words": words, "translations": translations}
+
+    async def _produce(self):
+        failures = 0
+        while True:
+            try:
+                title, text = await self._fetch_candidate()
+                article = await self._prepare(title, text)
+                if article is not None:
+                    failures = 0
+                    await self._queue.put(article)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except NLPBusyError:
+                # Не змагаємося з користувачами за воркери
+                await asyncio.sleep(5)
+                continue
+            except SkipArticle as e:
+                logging.info(f"Skipping random article: {e}")
+            except Exception as e:
+                logging.error(f"Article pool producer failed: {e}")
+                await asyncio.sleep(5)
+                continue
+            failures = min(failures + 1, 16)
+            await asyncio.sleep(min(ARTICLE_RETRY_DELAY * 2 ** (failures - 1), ARTICLE_RETRY_MAX_DELAY))
+
+    async def get(self):
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        logging.info("Article pool is empty, preparing an article on demand")
+        for _ in range(ON_DEMAND_ATTEMPTS):
+            try:
+                title, text = await self._fetch_candidate()
+            except SkipArticle as e:
+                logging.info(f"Skipping random article: {e}")
+                continue
+            article = await self._prepare(title, text)
+            if article is not None:
+                return article
+        return None
+
+
+article_pool = ArticlePool()
+_pools = {DEFAULT_LANGUAGE: article_pool}
+
+
+def get_pool(language):
+    # Пул основної мови запускається під час старту, решта — при першому запиті випадкової статті цією мовою
+    language = supported_language(language)
+    pool = _pools.get(language)
+    if pool is None:
+        pool = _pools[language] = ArticlePool(corpus_path=None, language=language)
+        pool.start()
+    return pool
+
+
+def prepared_articles():
+    return sum(len(pool) for pool in _pools.values())
+
+
+async def stop_all():
+    for pool in _pools.values():
+        await pool.stop()
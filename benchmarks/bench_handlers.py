@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Бенчмарк працює повністю в процесі: SQLite у пам'яті, сесії в пам'яті, без мережі
+WORK_DIR = tempfile.mkdtemp(prefix="quizzy-bench-")
+CORPUS_PATH = os.path.join(WORK_DIR, "corpus.jsonl")
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["DB_PATH"] = f"file:bench-{os.getpid()}?mode=memory&cache=shared"
+os.environ["SESSION_BACKEND"] = "memory"
+os.environ["RESULT_SPILL_DIR"] = os.path.join(WORK_DIR, "spill")
+os.environ["ARTICLE_CORPUS"] = CORPUS_PATH
+os.environ.setdefault("ARTICLE_POOL_SIZE", "2")
+
+PARAGRAPH = (
+    "The museum opened a new exhibition about ancient navigation. Curious visitors study wooden ships, "
+    "handwritten maps and bronze instruments that sailors carried across dangerous oceans. "
+    "Historians explain how careful observation of stars helped crews find distant harbours. "
+)
+TEXT_SIZES = {"small": 300, "medium": 5000, "large": 50000}
+
+with open(CORPUS_PATH, "w", encoding="utf-8") as f:
+    f.write(json.dumps({"title": "Navigation", "text": PARAGRAPH * 5}) + "\n")
+
+from aiogram import types
+from aiogram.client.session.base import BaseSession
+import main
+import translation_backends
+from text_analyzer import extract_important_words
+
+
+class FakeSession(BaseSession):
+    # Відповідає на виклики Telegram API локально, не відкриваючи з'єднань
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None and hasattr(method, "text"):
+            self._message_id += 1
+            return types.Message(
+                message_id=self._message_id,
+                date=datetime.now(),
+                chat=types.Chat(id=chat_id, type="private"),
+                text=method.text
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+async def fake_translate(words, target_lang="uk", source_lang="auto"):
+    return [f"{word}-{target_lang}" for word in words]
+
+
+def user(chat_id):
+    return types.User(id=chat_id, is_bot=False, first_name="Bench", username=f"bench{chat_id}")
+
+
+def message_update(update_id, chat_id, text):
+    return types.Update(update_id=update_id, message=types.Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=types.Chat(id=chat_id, type="private"),
+        from_user=user(chat_id),
+        text=text
+    ))
+
+
+def callback_update(update_id, chat_id, data, current_text="📍 Головне меню"):
+    return types.Update(update_id=update_id, callback_query=types.CallbackQuery(
+        id=str(update_id),
+        from_user=user(chat_id),
+        chat_instance="bench",
+        data=data,
+        message=types.Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=types.Chat(id=chat_id, type="private"),
+            text=current_text
+        )
+    ))
+
+
+def quiz_state(words):
+    return {
+        "stage": "quiz",
+        "words": words,
+        "translations": [f"{word}-uk" for word in words],
+        "current_word_index": 0,
+        "attempts": 3,
+        "total_words": len(words),
+        "language": "en",
+        "current_translation": f"{words[0]}-uk",
+    }
+
+
+# Кожен сценарій повертає (підготовка стану, оновлення)
+def scenarios():
+    words = ["museum", "exhibition", "navigation", "ship", "map"]
+    return {
+        "start": lambda i, chat_id: (None, message_update(i, chat_id, "/start")),
+        "stats_command": lambda i, chat_id: (None, message_update(i, chat_id, "/stats")),
+        "callback_language": lambda i, chat_id: (None, callback_update(i, chat_id, "lang:en")),
+        "callback_main_menu": lambda i, chat_id: ({"stage": "quiz"}, callback_update(i, chat_id, "main_menu")),
+        "callback_help": lambda i, chat_id: (None, callback_update(i, chat_id, "show_help")),
+        "callback_stats": lambda i, chat_id: (None, callback_update(i, chat_id, "view_stats")),
+        "text_submission": lambda i, chat_id: (
+            {"stage": "waiting_for_text", "language": "en"},
+            message_update(i, chat_id, f"{PARAGRAPH} Report number {i} describes the voyage.")
+        ),
+        "quiz_answer_correct": lambda i, chat_id: (quiz_state(words), message_update(i, chat_id, "museum-uk")),
+        "quiz_answer_wrong": lambda i, chat_id: (quiz_state(words), message_update(i, chat_id, "wrong")),
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name, timings, elapsed):
+    timings = sorted(timings)
+    return {
+        "name": name,
+        "count": len(timings),
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "per_second": len(timings) / elapsed if elapsed else 0.0,
+    }
+
+
+async def bench_handler(name, make_update, iterations, warmup):
+    timings = []
+    started = time.perf_counter()
+    for i in range(warmup + iterations):
+        chat_id = 10_000 + i
+        state, update = make_update(i + 1, chat_id)
+        await main.add_user(chat_id, f"bench{chat_id}")
+        if state is not None:
+            await main.sessions.set(chat_id, state)
+        if i == warmup:
+            started = time.perf_counter()
+        t0 = time.perf_counter()
+        await main.dp.feed_update(main.bot, update)
+        # Аналіз тексту йде фоновою задачею, тож чекаємо і на неї
+        await main.analysis_jobs.wait(chat_id)
+        if i >= warmup:
+            timings.append(time.perf_counter() - t0)
+    return summarize(name, timings, time.perf_counter() - started)
+
+
+def bench_extraction(iterations):
+    results = []
+    for size_name, size in TEXT_SIZES.items():
+        text = (PARAGRAPH * (size // len(PARAGRAPH) + 1))[:size]
+        extract_important_words(text)
+        timings = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            extract_important_words(text)
+            timings.append(time.perf_counter() - t0)
+        results.append(summarize(f"extract_important_words[{size_name}]", timings, time.perf_counter() - started))
+    return results
+
+
+def print_table(results):
+    print(f"{'benchmark':<36} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per sec':>9}")
+    for r in results:
+        print(f"{r['name']:<36} {r['count']:>5} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['per_second']:>9.1f}")
+
+
+async def run(args):
+    translation_backends.translate_batch_async = fake_translate
+    main.bot.session = FakeSession()
+    main.bot.session.middleware(main.TelegramMetricsMiddleware())
+    await main.on_startup()
+    try:
+        selected = scenarios()
+        if args.only:
+            selected = {name: fn for name, fn in selected.items() if name in args.only.split(",")}
+        results = []
+        for name, make_update in selected.items():
+            results.append(await bench_handler(name, make_update, args.iterations, args.warmup))
+        if not args.skip_nlp:
+            results.extend(bench_extraction(args.nlp_iterations))
+        return results
+    finally:
+        await main.on_shutdown()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="In-process latency benchmark for bot handlers")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--nlp-iterations", type=int, default=20)
+    parser.add_argument("--only", help="Comma-separated handler scenarios to run")
+    parser.add_argument("--skip-nlp", action="store_true", help="Skip the extract_important_words benchmark")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit with status 1 if any benchmark's p95 exceeds this")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.max_p95_ms is not None:
+        slow = [r["name"] for r in results if r["p95_ms"] > args.max_p95_ms]
+        if slow:
+            print(f"p95 above {args.max_p95_ms} ms: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
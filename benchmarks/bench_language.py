@@ -0,0 +1,62 @@
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langdetect import detect as langdetect_detect
+import language
+
+SAMPLE_PARAGRAPH = (
+    "The history of the city goes back to a small settlement on the river bank. "
+    "Merchants travelled along the valley, and the market slowly grew into a busy town "
+    "with stone houses, narrow streets and a cathedral that still dominates the skyline. "
+)
+
+
+def load_texts(paths, sizes):
+    if paths:
+        texts = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+        return texts
+    return [(SAMPLE_PARAGRAPH * (size // len(SAMPLE_PARAGRAPH) + 1))[:size] for size in sizes]
+
+
+def measure(fn, text, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(text)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return result, timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-text langdetect with the sampled detection stage")
+    parser.add_argument("files", nargs="*", help="Text files to benchmark (synthetic texts are used by default)")
+    parser.add_argument("--sizes", default="500,5000,50000,200000", help="Synthetic text sizes in characters")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_texts(args.files, [int(size) for size in args.sizes.split(",")])
+    print(f"{'chars':>8} {'full ms':>9} {'sampled ms':>11} {'speedup':>8}  result")
+    for text in texts:
+        full_language, full_ms = measure(langdetect_detect, text, args.repeat)
+
+        def sampled(text):
+            language._cache.clear()
+            return language.detect_with_confidence(text)
+
+        (sampled_language, confidence), sampled_ms = measure(sampled, text, args.repeat)
+        agreement = "same" if sampled_language == full_language else f"DIFFERENT ({full_language})"
+        print(f"{len(text):>8} {full_ms:>9.1f} {sampled_ms:>11.1f} {full_ms / sampled_ms:>7.1f}x  "
+              f"{sampled_language} p={confidence:.3f} {agreement}")
+
+
+if __name__ == "__main__":
+    main()
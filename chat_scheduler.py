@@ -0,0 +1,68 @@
+import os
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from aiogram import BaseMiddleware
+import metrics
+
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+
+
+class ChatScheduler(BaseMiddleware):
+    # Оновлення одного чату обробляються строго по черзі, бо обробники читають і змінюють
+    # стан сесії через кілька await. Різні чати йдуть паралельно, але не більше UPDATE_CONCURRENCY одночасно
+    def __init__(self, concurrency=UPDATE_CONCURRENCY):
+        self.concurrency = concurrency
+        self.waiting = 0
+        self.running = 0
+        self._semaphore = None
+        # chat_id -> [lock, кількість оновлень, що тримають або чекають lock]
+        self._chats = {}
+
+    @asynccontextmanager
+    async def chat(self, chat_id):
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock пропускає в порядку черги, тож оновлення чату не обганяють одне одного
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            # Черга чату видаляється, щойно в ній нікого не лишилось
+            if not entry[1]:
+                del self._chats[chat_id]
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+
+    def stats(self):
+        return {
+            "waiting": self.waiting,
+            "running": self.running,
+            "chats": len(self._chats),
+            "deepest": max((users for _, users in self._chats.values()), default=0),
+        }
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        async with AsyncExitStack() as stack:
+            self.waiting += 1
+            try:
+                with metrics.track("updates.queue_wait"):
+                    # Спершу черга чату, потім глобальний слот: чат, що чекає на себе, не займає слот
+                    if chat is not None:
+                        await stack.enter_async_context(self.chat(chat.id))
+                    await stack.enter_async_context(self._slot())
+            finally:
+                self.waiting -= 1
+            return await handler(event, data)
@@ -12,7 +12,7 @@ def view_all_data():
     c = conn.cursor()
     c.execute("SELECT * FROM users")
     users = c.fetchall()
-    c.execute("SELECT user_id, word, correct, timestamp FROM quiz_results")
+    c.execute("SELECT user_id, word, is_correct, answered_at FROM quiz_results ORDER BY answered_at")
     results = c.fetchall()
     conn.close()
     return users, results
@@ -1,25 +1,47 @@
 import os
-import psycopg2
-from psycopg2 import sql
-from datetime import datetime
+import csv
+import json
+import asyncio
+import queue
+import threading
+import sqlite3
+import random
 import logging
+from datetime import datetime, timedelta
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+from metrics import timed
+import migrations
+import srs
 
 logging.basicConfig(level=logging.INFO)
 
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
+DB_PATH = os.getenv("DB_PATH", "file:quizzy?mode=memory&cache=shared")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+QUIZ_RESULTS_RETENTION_DAYS = int(os.getenv("QUIZ_RESULTS_RETENTION_DAYS", "90"))
+ROLLUP_LOCK_ID = 7215002
+# Помилки, спричинені самими рядками, а не недоступністю БД: повтор запису їх не виправить
+DATA_ERRORS = (sqlite3.IntegrityError, sqlite3.DataError, psycopg2.IntegrityError, psycopg2.DataError)
 
-if not all([DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT]):
-    logging.error("One or more database environment variables are missing")
-    raise ValueError("One or more database environment variables are missing")
 
-def init_db():
-    try:
-        logging.info("Attempting to connect to the database...")
-        conn = psycopg2.connect(
+class PostgresBackend:
+    name = "postgres"
+
+    def __init__(self, minconn, maxconn):
+        if not all([DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT]):
+            logging.error("One or more database environment variables are missing")
+            raise ValueError("One or more database environment variables are missing")
+        self._pool = pool.ThreadedConnectionPool(
+            minconn,
+            maxconn,
             dbname=DB_NAME,
             user=DB_USER,
             password=DB_PASSWORD,
@@ -27,112 +49,637 @@ def init_db():
             port=DB_PORT,
             sslmode="require"
         )
-        c = conn.cursor()
-
-        logging.info("Creating table 'users' if it does not exist...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id BIGINT PRIMARY KEY,
-                username TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        logging.info("Creating table 'quiz_results' if it does not exist...")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT REFERENCES users(user_id),
-                word TEXT NOT NULL,
-                is_correct BOOLEAN NOT NULL,
-                answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
 
+    def acquire(self):
+        return self._pool.getconn()
+
+    def release(self, conn, broken=False):
+        self._pool.putconn(conn, close=broken)
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    def stream_cursor(self, conn):
+        # Серверний курсор: рядки приходять порціями, а не всі одразу
+        cursor = conn.cursor(name=f"stream_{id(conn)}")
+        cursor.itersize = 1000
+        return cursor
+
+    def close(self):
+        self._pool.closeall()
+
+
+class _SQLiteCursor:
+    # SQLite використовує "?" замість "%s", тож перекладаємо запити на льоту
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(query.replace("%s", "?"), params)
+
+    def executemany(self, query, seq):
+        return self._cursor.executemany(query.replace("%s", "?"), seq)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, minconn, maxconn, path=DB_PATH):
+        self._path = path
+        # Спільний кеш SQLite одразу повертає "table is locked", якщо інше з'єднання тримає таблицю,
+        # тому з'єднання видаються по одному
+        self._lock = threading.Lock()
+        self._free = queue.LifoQueue()
+        self._size = 0
+        self._maxconn = maxconn
+        for _ in range(minconn):
+            self._free.put(self._connect())
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self._path,
+            uri=self._path.startswith("file:"),
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        self._size += 1
+        return conn
+
+    def acquire(self):
+        self._lock.acquire()
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            if self._size >= self._maxconn:
+                self._lock.release()
+                raise pool.PoolError("connection pool exhausted")
+            try:
+                return self._connect()
+            except Exception:
+                self._lock.release()
+                raise
+
+    def release(self, conn, broken=False):
+        try:
+            if broken:
+                conn.close()
+                self._size -= 1
+            else:
+                self._free.put(conn)
+        finally:
+            self._lock.release()
+
+    def cursor(self, conn):
+        return _SQLiteCursor(conn.cursor())
+
+    def stream_cursor(self, conn):
+        return self.cursor(conn)
+
+    def close(self):
+        while not self._free.empty():
+            self._free.get_nowait().close()
+        self._size = 0
+
+
+BACKENDS = {
+    "postgres": PostgresBackend,
+    "sqlite": SQLiteBackend,
+}
+
+_backend = None
+_slots = None
+_open_lock = None
+
+
+async def open_pool(backend=None):
+    global _backend, _slots, _open_lock
+    if _backend is not None:
+        return _backend
+    if _open_lock is None:
+        _open_lock = asyncio.Lock()
+    async with _open_lock:
+        if _backend is None:
+            if backend is None:
+                backend_cls = BACKENDS.get(DB_BACKEND)
+                if backend_cls is None:
+                    raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+                logging.info(f"Opening {DB_BACKEND} pool ({DB_POOL_MIN}-{DB_POOL_MAX} connections)...")
+                backend = await asyncio.to_thread(backend_cls, DB_POOL_MIN, DB_POOL_MAX)
+            _slots = asyncio.Semaphore(DB_POOL_MAX)
+            _backend = backend
+    return _backend
+
+
+async def close_pool():
+    global _backend, _slots
+    if _backend is None:
+        return
+    backend, _backend, _slots = _backend, None, None
+    await asyncio.to_thread(backend.close)
+    logging.info("Database pool closed")
+
+
+def _dialect():
+    # Діалект визначає відкритий бекенд, а не змінна оточення: open_pool може отримати його ззовні
+    return _backend.name
+
+
+def _run_sync(backend, fn, stream=False):
+    conn = backend.acquire()
+    broken = False
+    try:
+        c = backend.stream_cursor(conn) if stream else backend.cursor(conn)
+        result = fn(c)
         conn.commit()
-        conn.close()
-        logging.info("Database initialized successfully")
+        return result
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        backend.release(conn, broken=broken)
+
+
+async def _run(fn, stream=False):
+    backend = await open_pool()
+    async with _slots:
+        return await asyncio.to_thread(_run_sync, backend, fn, stream)
+
+
+async def check_health():
+    try:
+        await _run(lambda c: c.execute("SELECT 1"))
+        return True
+    except Exception as e:
+        logging.error(f"Database health check failed: {e}")
+        return False
+
+
+async def warm_up():
+    # Відкриваємо мінімальну кількість з'єднань заздалегідь, щоб перший запит не чекав на TLS
+    # Помилку не ковтаємо: init_db має впасти, а не стартувати з недоступною базою
+    await asyncio.gather(*(_run(lambda c: c.execute("SELECT 1")) for _ in range(DB_POOL_MIN)))
+
+
+@timed("db.init_db")
+async def init_db():
+    try:
+        logging.info("Attempting to connect to the database...")
+        await open_pool()
+        await warm_up()
+        applied = await _run(lambda c: migrations.migrate(c, _dialect()))
+        logging.info(f"Database initialized successfully, {applied} migrations applied")
     except Exception as e:
         logging.error(f"Error initializing database: {e}")
         raise
 
 # Додавання користувача
-def add_user(user_id, username):
+@timed("db.add_user")
+async def add_user(user_id, username):
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            sslmode="require"
-        )
-        c = conn.cursor()
-        c.execute('INSERT INTO users (user_id, username) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING', (user_id, username))
-        conn.commit()
-        conn.close()
+        await _run(lambda c: c.execute(
+            'INSERT INTO users (user_id, username) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING',
+            (user_id, username)
+        ))
         logging.info(f"User {user_id} added successfully")
     except Exception as e:
         logging.error(f"Error adding user {user_id}: {e}")
         raise
 
 # Збереження результату квіза
-def save_quiz_result(user_id, word, is_correct):
+_INCREMENT_STATS = (
+    'INSERT INTO user_stats (user_id, total_answers, correct_answers) VALUES (%s, %s, %s) '
+    'ON CONFLICT (user_id) DO UPDATE SET '
+    'total_answers = user_stats.total_answers + EXCLUDED.total_answers, '
+    'correct_answers = user_stats.correct_answers + EXCLUDED.correct_answers, '
+    'updated_at = CURRENT_TIMESTAMP'
+)
+
+# Пакетне збереження результатів квіза
+@timed("db.save_quiz_results")
+async def save_quiz_results(results):
+    if not results:
+        return
+    stats = {}
+    for user_id, _, is_correct, *_ in results:
+        total, correct = stats.get(user_id, (0, 0))
+        stats[user_id] = (total + 1, correct + (1 if is_correct else 0))
+
+    rows = [result[:4] for result in results]
+
+    def query(c):
+        if _dialect() == "postgres":
+            execute_values(
+                c,
+                'INSERT INTO quiz_results (user_id, word, is_correct, answered_at) VALUES %s',
+                rows,
+                page_size=500
+            )
+        else:
+            c.executemany(
+                'INSERT INTO quiz_results (user_id, word, is_correct, answered_at) VALUES (%s, %s, %s, %s)',
+                rows
+            )
+        c.executemany(_INCREMENT_STATS, [(user_id, total, correct) for user_id, (total, correct) in stats.items()])
+        _update_review_cards(c, results)
+
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            sslmode="require"
+        await _run(query)
+        logging.info(f"Saved {len(results)} quiz results for {len(stats)} users")
+    except Exception as e:
+        logging.error(f"Error saving {len(results)} quiz results: {e}")
+        raise
+
+def _update_review_cards(c, results):
+    keys = list(dict.fromkeys((result[0], result[1]) for result in results))
+    placeholders = ", ".join(["(%s, %s)"] * len(keys))
+    c.execute(
+        f'SELECT user_id, word, ease, interval_days, repetitions FROM review_cards WHERE (user_id, word) IN ({placeholders})',
+        [value for key in keys for value in key]
+    )
+    cards = {(row[0], row[1]): (row[2], row[3], row[4], None) for row in c.fetchall()}
+    translations = {}
+    for user_id, word, is_correct, answered_at, quality, translation in results:
+        ease, interval_days, repetitions, _ = cards.get((user_id, word), (srs.DEFAULT_EASE, 0, 0, None))
+        if quality is None:
+            quality = srs.answer_quality(is_correct)
+        cards[(user_id, word)] = srs.schedule(ease, interval_days, repetitions, quality, answered_at)
+        if translation:
+            translations[(user_id, word)] = translation
+    c.executemany(
+        'INSERT INTO review_cards (user_id, word, translation, ease, interval_days, repetitions, due_at, reminded) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s, FALSE) '
+        'ON CONFLICT (user_id, word) DO UPDATE SET '
+        'translation = COALESCE(EXCLUDED.translation, review_cards.translation), '
+        'ease = EXCLUDED.ease, interval_days = EXCLUDED.interval_days, repetitions = EXCLUDED.repetitions, '
+        'due_at = EXCLUDED.due_at, reminded = FALSE',
+        [(user_id, word, translations.get((user_id, word)), *card) for (user_id, word), card in cards.items()
+         if card[3] is not None]
+    )
+
+# Картки для повторення, в яких настав час
+@timed("db.get_due_cards")
+async def get_due_cards(user_id, limit=10):
+    def query(c):
+        c.execute(
+            'SELECT word, translation FROM review_cards WHERE user_id = %s AND due_at <= %s '
+            'ORDER BY due_at LIMIT %s',
+            (user_id, datetime.utcnow(), limit)
         )
-        c = conn.cursor()
-        c.execute('INSERT INTO quiz_results (user_id, word, is_correct) VALUES (%s, %s, %s)', (user_id, word, is_correct))
-        conn.commit()
-        conn.close()
-        logging.info(f"Quiz result for user {user_id} saved successfully")
+        return c.fetchall()
+
+    try:
+        return await _run(query)
+    except Exception as e:
+        logging.error(f"Error getting due cards for user {user_id}: {e}")
+        raise
+
+# Позначаємо картки як нагадані й повертаємо, кому і скільки слів нагадати
+@timed("db.claim_due_reminders")
+async def claim_due_reminders(now, batch_size):
+    def query(c):
+        c.execute(
+            'UPDATE review_cards SET reminded = TRUE '
+            'WHERE reminded = FALSE AND due_at <= %s AND user_id IN ('
+            '    SELECT user_id FROM review_cards WHERE reminded = FALSE AND due_at <= %s '
+            '    GROUP BY user_id ORDER BY user_id LIMIT %s'
+            ') RETURNING user_id',
+            (now, now, batch_size)
+        )
+        counts = {}
+        for (user_id,) in c.fetchall():
+            counts[user_id] = counts.get(user_id, 0) + 1
+        return counts
+
+    try:
+        return await _run(query)
     except Exception as e:
-        logging.error(f"Error saving quiz result for user {user_id}: {e}")
+        logging.error(f"Error claiming due reminders: {e}")
         raise
 
 # Отримання статистики користувача
-def get_user_stats(user_id):
+@timed("db.get_user_stats")
+async def get_user_stats(user_id):
+    def query(c):
+        c.execute('SELECT total_answers, correct_answers FROM user_stats WHERE user_id = %s', (user_id,))
+        row = c.fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            sslmode="require"
-        )
-        c = conn.cursor()
-        c.execute('SELECT COUNT(*) FROM quiz_results WHERE user_id = %s', (user_id,))
-        total_words = c.fetchone()[0]
-        c.execute('SELECT COUNT(*) FROM quiz_results WHERE user_id = %s AND is_correct = TRUE', (user_id,))
-        correct_answers = c.fetchone()[0]
-        conn.close()
-        return total_words, correct_answers
+        return await _run(query)
     except Exception as e:
         logging.error(f"Error getting stats for user {user_id}: {e}")
         raise
 
-def view_all_data():
+# Перерахунок лічильників з quiz_results (початкове заповнення та звірка)
+@timed("db.reconcile_user_stats")
+async def reconcile_user_stats(user_id=None):
+    user_filter = 'user_id = %s' if user_id is not None else 'TRUE'
+    params = (user_id, user_id) if user_id is not None else ()
+    totals = migrations.stats_totals_sql(user_filter)
+
+    def query(c):
+        if _dialect() == "postgres":
+            # Не даємо паралельним вставкам загубитися між підрахунком і записом
+            c.execute('LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE')
+        c.execute(f'''
+            SELECT COUNT(*) FROM ({totals}) r
+            LEFT JOIN user_stats s ON s.user_id = r.user_id
+            WHERE s.user_id IS NULL OR s.total_answers <> r.total OR s.correct_answers <> r.correct
+        ''', params)
+        drifted = c.fetchone()[0]
+        c.execute(f'''
+            INSERT INTO user_stats (user_id, total_answers, correct_answers)
+            SELECT user_id, total, correct FROM ({totals}) r WHERE TRUE
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_answers = EXCLUDED.total_answers,
+                correct_answers = EXCLUDED.correct_answers,
+                updated_at = CURRENT_TIMESTAMP
+        ''', params)
+        return drifted
+
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT,
-            sslmode="require"
+        drifted = await _run(query)
+        logging.info(f"Reconciled user stats, {drifted} users had drifted counters")
+        return drifted
+    except Exception as e:
+        logging.error(f"Error reconciling user stats: {e}")
+        raise
+
+def _rollup_sql(source, where):
+    day = "DATE(answered_at)" if _dialect() == "sqlite" else "CAST(answered_at AS DATE)"
+    return f'''
+        INSERT INTO quiz_results_daily (user_id, word, day, total, correct)
+        SELECT user_id, word, {day}, COUNT(*), SUM(CASE WHEN is_correct THEN 1 ELSE 0 END)
+        FROM {source} WHERE user_id IS NOT NULL AND {where}
+        GROUP BY user_id, word, {day}
+        ON CONFLICT (user_id, day, word) DO UPDATE SET
+            total = quiz_results_daily.total + EXCLUDED.total,
+            correct = quiz_results_daily.correct + EXCLUDED.correct
+    '''
+
+# Відповіді, старші за retention_days, згортаються в денні агрегати по користувачу й слову
+@timed("db.rollup_quiz_results")
+async def rollup_quiz_results(retention_days=QUIZ_RESULTS_RETENTION_DAYS):
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=retention_days), datetime.min.time())
+
+    def query(c):
+        if _dialect() == "sqlite":
+            c.execute(_rollup_sql("quiz_results", "answered_at < %s"), (cutoff,))
+            c.execute('DELETE FROM quiz_results WHERE answered_at < %s', (cutoff,))
+            return c.rowcount, 0
+        c.execute('SELECT pg_advisory_xact_lock(%s)', (ROLLUP_LOCK_ID,))
+        compacted = 0
+        dropped = 0
+        # Секції, цілком старші за межу, агрегуються й видаляються без построкового DELETE
+        for name, upper in sorted(migrations.list_partitions(c).items()):
+            if upper > cutoff:
+                continue
+            c.execute(f'LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE')
+            c.execute(f'SELECT COUNT(*) FROM {name}')
+            compacted += c.fetchone()[0]
+            c.execute(_rollup_sql(name, "TRUE"))
+            c.execute(f'DROP TABLE {name}')
+            dropped += 1
+        # Решта (секція за замовчуванням і поточні секції) переноситься одним запитом
+        c.execute(
+            'WITH moved AS (DELETE FROM quiz_results WHERE answered_at < %s '
+            'RETURNING user_id, word, is_correct, answered_at), '
+            f'rolled AS ({_rollup_sql("moved", "TRUE")} RETURNING 1) '
+            'SELECT COUNT(*) FROM moved',
+            (cutoff,)
         )
-        c = conn.cursor()
-        c.execute('SELECT * FROM users')
-        users = c.fetchall()
-        conn.close()
-        return users
-    except Exception as e:
-        logging.error(f"Error viewing all data: {e}")
-        raise
\ No newline at end of file
+        compacted += c.fetchone()[0]
+        migrations.ensure_partitions(c)
+        return compacted, dropped
+
+    try:
+        compacted, dropped = await _run(query)
+        logging.info(f"Rolled up quiz results older than {cutoff:%Y-%m-%d}: {compacted} rows, {dropped} partitions dropped")
+        return compacted, dropped
+    except Exception as e:
+        logging.error(f"Error rolling up quiz results: {e}")
+        raise
+
+# Посторінковий перегляд користувачів (keyset pagination)
+@timed("db.list_users")
+async def list_users(after_id=None, before_id=None, limit=20):
+    def query(c):
+        if before_id is not None:
+            c.execute(
+                'SELECT user_id, username, created_at FROM users WHERE user_id < %s ORDER BY user_id DESC LIMIT %s',
+                (before_id, limit + 1)
+            )
+            rows = c.fetchall()
+            has_more = len(rows) > limit
+            rows = list(reversed(rows[:limit]))
+            return rows, has_more, True
+        if after_id is not None:
+            c.execute(
+                'SELECT user_id, username, created_at FROM users WHERE user_id > %s ORDER BY user_id LIMIT %s',
+                (after_id, limit + 1)
+            )
+        else:
+            c.execute('SELECT user_id, username, created_at FROM users ORDER BY user_id LIMIT %s', (limit + 1,))
+        rows = c.fetchall()
+        return rows[:limit], after_id is not None, len(rows) > limit
+
+    try:
+        rows, has_prev, has_next = await _run(query)
+        if before_id is not None and not rows:
+            has_next = False
+        return rows, has_prev, has_next
+    except Exception as e:
+        logging.error(f"Error listing users: {e}")
+        raise
+
+EXPORTS = {
+    "users": ('SELECT user_id, username, created_at FROM users ORDER BY user_id',
+              ["user_id", "username", "created_at"]),
+    "quiz_results": ('SELECT id, user_id, word, is_correct, answered_at FROM quiz_results ORDER BY id',
+                     ["id", "user_id", "word", "is_correct", "answered_at"]),
+    "quiz_results_daily": ('SELECT user_id, word, day, total, correct FROM quiz_results_daily ORDER BY day, user_id, word',
+                           ["user_id", "word", "day", "total", "correct"]),
+}
+
+# Потоковий експорт таблиці у CSV/JSONL-файл
+@timed("db.export_table")
+async def export_table(table, fmt, path):
+    query_sql, columns = EXPORTS[table]
+
+    def query(c):
+        c.execute(query_sql)
+        count = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+            for row in c:
+                if fmt == "csv":
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n")
+                count += 1
+        return count
+
+    try:
+        count = await _run(query, stream=True)
+        logging.info(f"Exported {count} rows from {table} to {path}")
+        return count
+    except Exception as e:
+        logging.error(f"Error exporting {table}: {e}")
+        raise
+
+# Кеш перекладів
+@timed("db.get_translations")
+async def get_translations(words, target_lang, source_lang="en"):
+    if not words:
+        return {}
+
+    def query(c):
+        placeholders = ", ".join(["%s"] * len(words))
+        c.execute(
+            'SELECT word, translation FROM translations '
+            f'WHERE source_lang = %s AND target_lang = %s AND word IN ({placeholders})',
+            (source_lang, target_lang, *words)
+        )
+        return dict(c.fetchall())
+
+    try:
+        return await _run(query)
+    except Exception as e:
+        logging.error(f"Error reading cached translations: {e}")
+        raise
+
+@timed("db.save_translations")
+async def save_translations(translations, target_lang, source_lang="en"):
+    if not translations:
+        return
+    rows = [(word, source_lang, target_lang, translation) for word, translation in translations.items()]
+    try:
+        await _run(lambda c: c.executemany(
+            'INSERT INTO translations (word, source_lang, target_lang, translation) VALUES (%s, %s, %s, %s) '
+            'ON CONFLICT (word, source_lang, target_lang) DO UPDATE SET translation = EXCLUDED.translation, updated_at = CURRENT_TIMESTAMP',
+            rows
+        ))
+    except Exception as e:
+        logging.error(f"Error saving translations: {e}")
+        raise
+
+# Стан сесій
+@timed("db.load_session")
+async def load_session(chat_id, idle_ttl):
+    def query(c):
+        c.execute(
+            'SELECT data FROM sessions WHERE chat_id = %s AND updated_at > %s',
+            (chat_id, datetime.utcnow() - timedelta(seconds=idle_ttl))
+        )
+        row = c.fetchone()
+        return row[0] if row else None
+
+    try:
+        return await _run(query)
+    except Exception as e:
+        logging.error(f"Error loading session {chat_id}: {e}")
+        raise
+
+@timed("db.save_session")
+async def save_session(chat_id, data):
+    try:
+        await _run(lambda c: c.execute(
+            'INSERT INTO sessions (chat_id, data, updated_at) VALUES (%s, %s, %s) '
+            'ON CONFLICT (chat_id) DO UPDATE SET data = EXCLUDED.data, updated_at = EXCLUDED.updated_at',
+            (chat_id, data, datetime.utcnow())
+        ))
+    except Exception as e:
+        logging.error(f"Error saving session {chat_id}: {e}")
+        raise
+
+@timed("db.delete_session")
+async def delete_session(chat_id):
+    try:
+        await _run(lambda c: c.execute('DELETE FROM sessions WHERE chat_id = %s', (chat_id,)))
+    except Exception as e:
+        logging.error(f"Error deleting session {chat_id}: {e}")
+        raise
+
+@timed("db.purge_sessions")
+async def purge_sessions(idle_ttl):
+    def query(c):
+        c.execute('DELETE FROM sessions WHERE updated_at < %s', (datetime.utcnow() - timedelta(seconds=idle_ttl),))
+        return c.rowcount
+
+    try:
+        return await _run(query)
+    except Exception as e:
+        logging.error(f"Error purging sessions: {e}")
+        raise
+
+# Готові колоди, підготовлені командою build-decks
+@timed("db.get_deck_keys")
+async def get_deck_keys():
+    def query(c):
+        c.execute('SELECT source_key FROM decks')
+        return {row[0] for row in c}
+
+    try:
+        return await _run(query, stream=True)
+    except Exception as e:
+        logging.error(f"Error reading deck keys: {e}")
+        raise
+
+@timed("db.save_decks")
+async def save_decks(decks):
+    # decks: (source_key, title, language, target_lang, words, translations)
+    if not decks:
+        return
+    rows = [
+        (key, title, language, target_lang, json.dumps(words, ensure_ascii=False), json.dumps(translations, ensure_ascii=False))
+        for key, title, language, target_lang, words, translations in decks
+    ]
+    try:
+        await _run(lambda c: c.executemany(
+            'INSERT INTO decks (source_key, title, language, target_lang, words, translations) '
+            'VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (source_key) DO NOTHING',
+            rows
+        ))
+    except Exception as e:
+        logging.error(f"Error saving {len(decks)} decks: {e}")
+        raise
+
+@timed("db.get_random_deck")
+async def get_random_deck(language, target_lang="uk"):
+    # Випадковий id у межах діапазону замість ORDER BY random(), щоб не сканувати всю таблицю
+    def query(c):
+        c.execute(
+            "SELECT MIN(id), MAX(id) FROM decks WHERE language = %s AND target_lang = %s AND words <> '[]'",
+            (language, target_lang)
+        )
+        low, high = c.fetchone()
+        if low is None:
+            return None
+        c.execute(
+            "SELECT title, words, translations FROM decks "
+            "WHERE language = %s AND target_lang = %s AND words <> '[]' AND id >= %s ORDER BY id LIMIT 1",
+            (language, target_lang, random.randint(low, high))
+        )
+        return c.fetchone()
+
+    try:
+        row = await _run(query)
+    except Exception as e:
+        logging.error(f"Error getting a deck for {language}: {e}")
+        raise
+    if row is None:
+        return None
+    title, words, translations = row
+    return {"title": title, "words": json.loads(words), "translations": json.loads(translations)}
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import database
+from nlp_models import load_model
+from text_analyzer import extract_important_words_batch
+from translations import translate_words
+
+DECK_CHUNK_SIZE = int(os.getenv("DECK_CHUNK_SIZE", "32"))
+DECK_MIN_WORDS = int(os.getenv("DECK_MIN_WORDS", "3"))
+
+
+def _init_worker(language):
+    load_model(language)
+
+
+def iter_corpus(path):
+    # Каталог із .txt файлами (ключ — відносний шлях) або JSONL з полями title, text і необов'язковим id
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith(".txt"):
+                    continue
+                full_path = os.path.join(root, name)
+                with open(full_path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+                yield os.path.relpath(full_path, path), os.path.splitext(name)[0], text
+        return
+    base = os.path.basename(path)
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = str(item.get("id") or f"{base}:{line_number}")
+            yield key, item.get("title", ""), item["text"]
+
+
+def count_corpus(path):
+    if os.path.isdir(path):
+        return sum(1 for _, _, files in os.walk(path) for name in files if name.endswith(".txt"))
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class Progress:
+    def __init__(self, total, every=5.0):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.skipped = 0
+        self.saved = 0
+        self.started = time.monotonic()
+        self._reported = 0.0
+
+    def update(self, done=0, skipped=0, saved=0, force=False):
+        self.done += done
+        self.skipped += skipped
+        self.saved += saved
+        now = time.monotonic()
+        if not force and now - self._reported < self.every:
+            return
+        self._reported = now
+        elapsed = now - self.started
+        processed = self.done - self.skipped
+        rate = processed / elapsed if elapsed else 0.0
+        left = self.total - self.done
+        eta = f"{left / rate:.0f}s" if rate else "?"
+        logging.info(
+            f"Decks: {self.done}/{self.total} texts, {self.saved} saved, {self.skipped} already built, "
+            f"{rate:.1f} texts/s, ETA {eta}"
+        )
+
+
+async def _save_chunk(chunk, words_per_text, language, target_lang):
+    # Унікальні слова всього шматка перекладаються одним викликом translate_words
+    unique_words = list(dict.fromkeys(word for words in words_per_text for word in words))
+    translated = dict(zip(unique_words, await translate_words(unique_words, target_lang, source_lang=language)))
+    decks = []
+    for (key, title, _), words in zip(chunk, words_per_text):
+        words = [word for word in words if translated.get(word)]
+        if len(words) < DECK_MIN_WORDS:
+            # Порожня колода лишається як позначка, що текст уже оброблено
+            words = []
+        decks.append((key, title, language, target_lang, words, [translated[word] for word in words]))
+    await database.save_decks(decks)
+    return sum(1 for deck in decks if deck[4])
+
+
+async def build_decks(path, workers=None, chunk_size=DECK_CHUNK_SIZE, language="en", target_lang="uk"):
+    # Тексти вже збудованих колод пропускаються, тому перерваний запуск можна просто повторити
+    existing = await database.get_deck_keys()
+    progress = Progress(count_corpus(path))
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    logging.info(f"Building decks from {path} with {workers} workers, {len(existing)} decks already built")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(language,)) as executor:
+        in_flight = set()
+
+        async def process(chunk):
+            words_per_text = await loop.run_in_executor(
+                executor, extract_important_words_batch, [text for _, _, text in chunk], language
+            )
+            saved = await _save_chunk(chunk, words_per_text, language, target_lang)
+            progress.update(done=len(chunk), saved=saved)
+
+        fresh = []
+        for item in iter_corpus(path):
+            if item[0] in existing:
+                progress.update(done=1, skipped=1)
+                continue
+            fresh.append(item)
+            if len(fresh) < chunk_size:
+                continue
+            # Не більше двох шматків на процес одночасно, щоб не тримати весь корпус у пам'яті
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    task.result()
+            in_flight.add(asyncio.create_task(process(fresh)))
+            fresh = []
+        if fresh:
+            in_flight.add(asyncio.create_task(process(fresh)))
+        if in_flight:
+            for task in (await asyncio.wait(in_flight))[0]:
+                task.result()
+
+    progress.update(force=True)
+    return progress.saved
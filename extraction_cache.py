@@ -0,0 +1,157 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from http_client import fetch
+from metrics import timed
+from nlp_models import DEFAULT_LANGUAGE
+from nlp_pool import detect_language, extract_words
+from text_analyzer import paragraph_text
+
+EXTRACTION_CACHE_BYTES = int(os.getenv("EXTRACTION_CACHE_BYTES", str(64 * 1024 * 1024)))
+EXTRACTION_CACHE_TTL = float(os.getenv("EXTRACTION_CACHE_TTL", str(6 * 3600)))
+
+TRACKING_PARAMS = {"fbclid", "gclid", "yclid", "mc_cid", "mc_eid", "ref"}
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_") and key not in TRACKING_PARAMS
+    )
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+class ContentCache:
+    # LRU, обмежений сумарним розміром записів і їхнім віком
+    def __init__(self, max_bytes=EXTRACTION_CACHE_BYTES, max_age=EXTRACTION_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is not None and time.monotonic() - item[2] > self.max_age:
+            self._remove(key)
+            item = None
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return item[0]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def touch(self, key):
+        item = self._data.get(key)
+        if item is not None:
+            self._data[key] = (item[0], item[1], time.monotonic())
+            self._data.move_to_end(key)
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, size, time.monotonic())
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self.size -= size
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+        }
+
+
+cache = ContentCache()
+
+
+@timed("extract_text_from_url")
+async def fetch_url_text(url):
+    page_key = ("page", normalize_url(url))
+    page = cache.get(page_key)
+    headers = {}
+    if page is not None and ("text", page["hash"]) in cache:
+        if page["etag"]:
+            headers["If-None-Match"] = page["etag"]
+        if page["last_modified"]:
+            headers["If-Modified-Since"] = page["last_modified"]
+    try:
+        response = await fetch(url, headers=headers)
+        if response.status == 304 and headers:
+            text = cache.get(("text", page["hash"]))
+            if text is not None:
+                cache.revalidated += 1
+                cache.touch(page_key)
+                return text, page["hash"]
+            # Текст встиг вийти з кешу, тож сторінка потрібна повністю
+            response = await fetch(url)
+    except Exception as e:
+        logging.warning(f"Failed to fetch {url}: {e!r}")
+        return None, None
+    if not response.ok:
+        return None, None
+
+    # Розбір великого HTML теж займає час, тому виносимо його з event loop
+    text = await asyncio.to_thread(paragraph_text, response.text())
+    key = content_hash(text)
+    cache.set(("text", key), text, len(text))
+    cache.set(page_key, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "hash": key,
+    }, len(page_key[1]) + 200)
+    return text, key
+
+
+async def detect_language_cached(text, key=None):
+    key = key or content_hash(text)
+    language = cache.get(("language", key))
+    if language is None:
+        language = await detect_language(text)
+        cache.set(("language", key), language, 100)
+    return language
+
+
+async def extract_words_cached(text, key=None, language=DEFAULT_LANGUAGE):
+    key = key or content_hash(text)
+    words = cache.get(("words", key, language))
+    if words is None:
+        words = await extract_words(text, language)
+        cache.set(("words", key, language), words, 100 + sum(len(word) for word in words))
+    return list(words)
@@ -0,0 +1,19 @@
+import gc
+import os
+import logging
+
+# PRELOAD_MODEL=true імпортує main.py (і завантажує модель spaCy) у майстер-процесі до fork воркерів
+preload_app = os.getenv("PRELOAD_MODEL", "false").lower() == "true"
+
+# Сесії в пам'яті живуть у своєму процесі: з кількома воркерами наступне оновлення
+# могло б потрапити в інший воркер і не знайти стан квіза, тому тоді воркер лише один
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+if os.getenv("SESSION_BACKEND", "memory").lower() == "memory" and workers > 1:
+    logging.warning(f"SESSION_BACKEND=memory is per process, running 1 worker instead of {workers}")
+    workers = 1
+
+
+def pre_fork(server, worker):
+    # Об'єкти майстра переносяться в постійне покоління GC, щоб збирач сміття у воркерах
+    # не торкався їхніх сторінок і не ламав спільне copy-on-write
+    gc.freeze()
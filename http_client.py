@@ -0,0 +1,95 @@
+import os
+import random
+import asyncio
+import json
+import logging
+import aiohttp
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", str(5 * 1024 * 1024)))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+USER_AGENT = "QuizzyCardsBot/1.0"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class HTTPResponse:
+    def __init__(self, status, headers, body, url, charset=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+        self.charset = charset
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    def text(self):
+        return self.body.decode(self.charset or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text())
+
+
+_session = None
+
+
+def get_session():
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_MAX_CONNECTIONS, limit_per_host=HTTP_PER_HOST_LIMIT),
+            timeout=aiohttp.ClientTimeout(total=None, connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT),
+            headers={"User-Agent": USER_AGENT}
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def _read_limited(response, max_bytes):
+    length = response.content_length
+    if length is not None and length > max_bytes:
+        raise ResponseTooLarge(f"{response.url} is {length} bytes, limit is {max_bytes}")
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            raise ResponseTooLarge(f"{response.url} is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def fetch(url, params=None, headers=None, method="GET", data=None, max_bytes=HTTP_MAX_RESPONSE_BYTES, retries=HTTP_RETRIES):
+    session = get_session()
+    for attempt in range(retries + 1):
+        try:
+            async with session.request(method, url, params=params, headers=headers, data=data) as response:
+                if response.status in RETRY_STATUSES and attempt < retries:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status
+                    )
+                body = await _read_limited(response, max_bytes)
+                return HTTPResponse(response.status, response.headers, body, str(response.url), response.charset)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == retries:
+                raise
+            # Експоненційна затримка з повним jitter, щоб повтори не йшли хвилею
+            delay = random.uniform(0, HTTP_BACKOFF * 2 ** attempt)
+            logging.warning(f"Request to {url} failed ({e!r}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
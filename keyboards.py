@@ -1,39 +1,82 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from nlp_models import SUPPORTED_LANGUAGES
+
+# Статичні клавіатури створюються один раз під час імпорту і спільні для всіх екранів,
+# тому їх не можна змінювати на місці
+
+LANGUAGE_NAMES = {
+    "en": "🇺🇸 English",
+    "de": "🇩🇪 Deutsch",
+    "fr": "🇫🇷 Français",
+    "es": "🇪🇸 Español",
+    "it": "🇮🇹 Italiano",
+    "pl": "🇵🇱 Polski",
+}
+
+# Кнопки лише для мов, для яких налаштовано модель spaCy, по дві в рядку
+_language_buttons = [
+    InlineKeyboardButton(text=LANGUAGE_NAMES.get(language, language.upper()), callback_data=f"lang:{language}")
+    for language in SUPPORTED_LANGUAGES
+]
+LANGUAGE_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    _language_buttons[i:i + 2] for i in range(0, len(_language_buttons), 2)
+])
+
+MAIN_MENU_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="📝 Почати квіз", callback_data="start_quiz")],
+    [InlineKeyboardButton(text="🔁 Повторення слів", callback_data="review_due")],
+    [InlineKeyboardButton(text="📊 Статистика", callback_data="view_stats")],
+    [InlineKeyboardButton(text="🌐 Змінити мову", callback_data="change_language")],
+    [InlineKeyboardButton(text="ℹ️ Довідка", callback_data="show_help")]
+])
+
+FINISH_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔄 Повторити квіз", callback_data="repeat_quiz")],
+    [InlineKeyboardButton(text="📝 Новий текст", callback_data="new_text")],
+    [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
+])
+
+TEXT_INPUT_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🎲 Випадковий текст", callback_data="random_text")],
+    [InlineKeyboardButton(text="🗂 Готова колода", callback_data="ready_deck")],
+    [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
+])
+
+REVIEW_REMINDER_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔁 Повторити слова", callback_data="review_due")],
+    [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
+])
+
+ANALYSIS_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✖️ Скасувати", callback_data="cancel_analysis")],
+    [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
+])
+
+BACK_TO_MENU_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
+])
 
 def get_language_inline_keyboard():
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="🇺🇸 English", callback_data="lang:en")
-        ]
-    ])
-    return keyboard
+    return LANGUAGE_KEYBOARD
 
 def get_main_menu_inline_keyboard():
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📝 Почати квіз", callback_data="start_quiz")],
-        [InlineKeyboardButton(text="📊 Статистика", callback_data="view_stats")],
-        [InlineKeyboardButton(text="🌐 Змінити мову", callback_data="change_language")],
-        [InlineKeyboardButton(text="ℹ️ Довідка", callback_data="show_help")]
-    ])
-    return keyboard
+    return MAIN_MENU_KEYBOARD
 
 def get_finish_inline_keyboard():
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔄 Повторити квіз", callback_data="repeat_quiz")],
-        [InlineKeyboardButton(text="📝 Новий текст", callback_data="new_text")],
-        [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-    ])
-    return keyboard
+    return FINISH_KEYBOARD
 
 def get_back_and_main_menu_keyboard():
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🎲 Випадковий текст", callback_data="random_text")],
-        [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-    ])
-    return keyboard
+    return TEXT_INPUT_KEYBOARD
 
 def get_quiz_menu_keyboard():
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-    ])
-    return keyboard
\ No newline at end of file
+    return BACK_TO_MENU_KEYBOARD
+
+def get_viewdata_keyboard(first_id, last_id, has_prev, has_next):
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"viewdata:prev:{first_id}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="Далі ➡️", callback_data=f"viewdata:next:{last_id}"))
+    rows = [navigation] if navigation else []
+    rows.append([InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
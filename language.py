@@ -0,0 +1,91 @@
+import os
+import hashlib
+from collections import OrderedDict
+
+LANGDETECT_SAMPLE_CHARS = int(os.getenv("LANGDETECT_SAMPLE_CHARS", "2000"))
+LANGDETECT_CHUNK_CHARS = int(os.getenv("LANGDETECT_CHUNK_CHARS", "500"))
+LANGDETECT_CONFIDENCE = float(os.getenv("LANGDETECT_CONFIDENCE", "0.95"))
+LANGDETECT_CACHE_SIZE = int(os.getenv("LANGDETECT_CACHE_SIZE", "4096"))
+
+_cache = OrderedDict()
+
+
+def _factory():
+    # langdetect потрібен лише у воркерах NLP, тож основний процес його не імпортує
+    from langdetect import DetectorFactory, detector_factory
+
+    # Без seed langdetect може давати різні відповіді для одного й того самого тексту
+    DetectorFactory.seed = 0
+    if detector_factory._factory is None:
+        detector_factory.init_factory()
+    return detector_factory._factory
+
+
+def sample_chunks(text, max_chars=LANGDETECT_SAMPLE_CHARS, chunk_chars=LANGDETECT_CHUNK_CHARS):
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+    # Беремо рівномірно розподілені шматки, щоб вступ чи підпис не визначали мову всього тексту
+    count = max(1, max_chars // chunk_chars)
+    step = (len(text) - chunk_chars) / max(1, count - 1)
+    chunks = []
+    for i in range(count):
+        start = int(i * step)
+        if start:
+            space = text.find(" ", start, start + 50)
+            start = space + 1 if space != -1 else start
+        chunks.append(text[start:start + chunk_chars])
+    return chunks
+
+
+def detect_sample(chunks):
+    from langdetect.lang_detect_exception import LangDetectException
+
+    # Перевіряємо дедалі більший префікс вибірки і зупиняємося, щойно впевненість достатня
+    best = ("unknown", 0.0)
+    for i in range(len(chunks)):
+        detector = _factory().create()
+        detector.append(" ".join(chunks[:i + 1]))
+        try:
+            probabilities = detector.get_probabilities()
+        except LangDetectException:
+            continue
+        if probabilities:
+            best = (probabilities[0].lang, probabilities[0].prob)
+            if best[1] >= LANGDETECT_CONFIDENCE:
+                break
+    if best[0] == "unknown":
+        raise LangDetectException(0, "No features in text.")
+    return best
+
+
+def _cache_key(chunks):
+    return hashlib.sha1("\x00".join(chunks).encode("utf-8", errors="replace")).hexdigest()
+
+
+def cached(chunks):
+    key = _cache_key(chunks)
+    result = _cache.get(key)
+    if result is not None:
+        _cache.move_to_end(key)
+    return key, result
+
+
+def remember(key, result):
+    _cache[key] = result
+    _cache.move_to_end(key)
+    while len(_cache) > LANGDETECT_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def detect_with_confidence(text):
+    chunks = sample_chunks(text)
+    key, result = cached(chunks)
+    if result is None:
+        result = detect_sample(chunks)
+        remember(key, result)
+    return result
+
+
+def detect(text):
+    return detect_with_confidence(text)[0]
@@ -1,44 +1,116 @@
+import time
+
+_import_started = time.perf_counter()
+
 import logging
 import os
 import asyncio
-from aiogram import Bot, Dispatcher, types
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.filters import Command, CommandStart
-from aiogram.exceptions import TelegramBadRequest
-from flask import Flask, request
-from text_analyzer import extract_important_words, extract_text_from_url
-from keyboards import get_language_inline_keyboard, get_main_menu_inline_keyboard, get_finish_inline_keyboard, get_back_and_main_menu_keyboard, get_quiz_menu_keyboard
-from utils import translate_word
-from database import init_db, add_user, save_quiz_result, get_user_stats, view_all_data
+import tempfile
 from dotenv import load_dotenv
-from langdetect import detect
-import wikipedia
 
+# .env має бути завантажений до імпорту модулів, які читають змінні оточення під час імпорту
 load_dotenv()
 
+from aiogram import BaseMiddleware, Bot, Dispatcher, types
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import FSInputFile
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.exceptions import TelegramBadRequest
+from webapp import ASGIApp
+from sessions import create_store
+from keyboards import BACK_TO_MENU_KEYBOARD, REVIEW_REMINDER_KEYBOARD, get_language_inline_keyboard, get_finish_inline_keyboard, get_back_and_main_menu_keyboard, get_quiz_menu_keyboard, get_viewdata_keyboard
+import screens
+from translations import translate_words, get_translation
+from nlp_models import DEFAULT_LANGUAGE, SUPPORTED_LANGUAGES, load_model, load_model_in_background, supported_language
+from nlp_pool import NLPBusyError, shutdown as shutdown_nlp_pool
+from extraction_cache import fetch_url_text, detect_language_cached, extract_words_cached
+from http_client import close_session
+from database import EXPORTS, init_db, close_pool, add_user, get_user_stats, list_users, export_table, get_due_cards, get_random_deck
+from result_writer import result_writer
+from article_pool import article_pool, get_pool, prepared_articles, stop_all as stop_article_pools
+from review_scheduler import ReviewScheduler
+from maintenance import maintenance
+from outbound import OutboundLimiter
+from chat_scheduler import ChatScheduler
+from analysis_jobs import analysis_jobs
+import srs
+import metrics
+import nlp_pool
+import extraction_cache
+
 TOKEN = os.getenv("BOT_TOKEN")
 if not TOKEN:
     raise ValueError("BOT_TOKEN is not set in environment variables")
 bot = Bot(token=TOKEN)
 dp = Dispatcher()
-app = Flask(__name__)
+app = ASGIApp()
 logging.basicConfig(level=logging.INFO)
+metrics.record_startup_phase("imports", time.perf_counter() - _import_started)
 
-user_state = {}
+sessions = create_store()
+# Redis прибирає сесії сам через EX, а таблиця sessions і пам'ять воркера — лише так
+maintenance.tasks.append(sessions.purge)
 ADMIN_ID = 700844744
+USERS_PAGE_SIZE = 20
+REVIEW_QUIZ_SIZE = 10
 
 IS_LOCAL = os.getenv("IS_LOCAL", "true").lower() == "true"
-
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
-
-wikipedia.set_lang("en")
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "false").lower() == "true"
+
+if PRELOAD_MODEL:
+    # Під gunicorn --preload (див. gunicorn.conf.py) це виконується в майстер-процесі до fork,
+    # тож воркери й їхні NLP-процеси ділять одну копію моделі через copy-on-write
+    with metrics.startup_phase("preload_model"):
+        load_model()
+
+BUSY_TEXT = (
+    "📍 Зачекай\n"
+    "⏳ Бот зараз обробляє багато текстів. Спробуй ще раз за хвилину."
+)
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        with metrics.track_update(event.event_type, event.update_id):
+            return await handler(event, data)
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        with metrics.track(f"telegram.{method.__api_method__}"):
+            return await make_request(bot, method)
+
+outbound = OutboundLimiter()
+chat_scheduler = ChatScheduler()
+
+dp.update.outer_middleware(UpdateMetricsMiddleware())
+dp.update.outer_middleware(chat_scheduler)
+bot.session.middleware(outbound)
+bot.session.middleware(TelegramMetricsMiddleware())
+
+metrics.Gauge("quizzy_nlp_queue_depth", "Jobs waiting for or running in the NLP pool", callback=nlp_pool.pending)
+metrics.Gauge("quizzy_article_pool_size", "Prepared random articles ready to serve", callback=prepared_articles)
+metrics.Gauge("quizzy_outbound_waiting", "Telegram requests waiting for a rate limit token", callback=lambda: outbound.waiting)
+metrics.Gauge(
+    "quizzy_update_queue", "Updates waiting for their chat or a free slot, running updates and active chat queues", ["stat"],
+    callback=chat_scheduler.stats
+)
+metrics.Gauge("quizzy_analysis_jobs", "Text analysis jobs running in the background", callback=lambda: len(analysis_jobs))
+metrics.Gauge("quizzy_background_updates", "Webhook updates still being processed", callback=lambda: len(background_tasks))
+metrics.Gauge(
+    "quizzy_extraction_cache", "Extraction cache counters and size", ["stat"],
+    callback=extraction_cache.cache.stats
+)
+
+async def get_progress(chat_id):
+    # Враховуємо відповіді, які ще чекають у буфері запису
+    total_words, correct_answers = await get_user_stats(chat_id)
+    pending_total, pending_correct = result_writer.pending_stats(chat_id)
+    return total_words + pending_total, correct_answers + pending_correct
 
 @dp.message(CommandStart())
 async def handle_start(message: types.Message):
     chat_id = message.chat.id
     username = message.from_user.username or message.from_user.first_name
-    add_user(chat_id, username)
+    await add_user(chat_id, username)
     await message.answer(
         "👋 Вітаю! Я Quizzy Cards — твій помічник у вивченні нових слів.\n"
         "📚 Надсилай текст або посилання, а я створю квіз із ключовими словами.\n"
@@ -50,20 +122,18 @@ async def handle_start(message: types.Message):
         "Обери мову тексту для квіза.",
         reply_markup=get_language_inline_keyboard()
     )
-    user_state[chat_id] = {"stage": "choose_language"}
+    await sessions.set(chat_id, {"stage": "choose_language"})
 
 @dp.message(Command("stats"))
 async def handle_stats(message: types.Message):
     chat_id = message.chat.id
-    total_words, correct_answers = get_user_stats(chat_id)
+    total_words, correct_answers = await get_progress(chat_id)
     await message.answer(
         f"📍 Статистика\n"
         f"Твій прогрес:\n"
         f"• Вивчено слів: {total_words}\n"
         f"• Правильних відповідей: {correct_answers}",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-        ])
+        reply_markup=BACK_TO_MENU_KEYBOARD
     )
 
 @dp.message(Command("viewdata"))
@@ -72,352 +142,426 @@ async def handle_viewdata(message: types.Message):
     if chat_id != ADMIN_ID:
         await message.answer("❌ Доступ заборонено!")
         return
-    users = view_all_data()
+    text, keyboard = await render_users_page()
+    await message.answer(text, reply_markup=keyboard)
+
+@dp.message(Command("export"))
+async def handle_export(message: types.Message, command: CommandObject):
+    chat_id = message.chat.id
+    if chat_id != ADMIN_ID:
+        await message.answer("❌ Доступ заборонено!")
+        return
+    args = (command.args or "users csv").split()
+    table = args[0]
+    fmt = args[1] if len(args) > 1 else "csv"
+    if table not in EXPORTS or fmt not in ("csv", "jsonl"):
+        await message.answer(
+            "Використання: /export <users|quiz_results|quiz_results_daily> [csv|jsonl]"
+        )
+        return
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        count = await export_table(table, fmt, path)
+        await message.answer_document(
+            FSInputFile(path, filename=f"{table}.{fmt}"),
+            caption=f"{table}: {count} рядків"
+        )
+    except Exception as e:
+        logging.error(f"Export failed: {e}")
+        await message.answer("❌ Не вдалося експортувати дані.")
+    finally:
+        os.remove(path)
+
+async def render_users_page(after_id=None, before_id=None):
+    users, has_prev, has_next = await list_users(after_id=after_id, before_id=before_id, limit=USERS_PAGE_SIZE)
     user_text = "\n".join([f"ID: {u[0]}, Username: {u[1]}, Created: {u[2]}" for u in users])
-    await message.answer(
-        f"Користувачі:\n{user_text or 'Пусто'}",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-        ])
-    )
+    text = f"Користувачі:\n{user_text or 'Пусто'}"[:4096]
+    first_id = users[0][0] if users else 0
+    last_id = users[-1][0] if users else 0
+    return text, get_viewdata_keyboard(first_id, last_id, has_prev, has_next)
+
+callback_routes = {}
+
+def callback_route(name):
+    def decorator(handler):
+        callback_routes[name] = handler
+        return handler
+    return decorator
+
+async def show_screen(callback, text, keyboard=None, answer_text=None):
+    # Єдине місце, де вирішується, чи потрібно редагувати повідомлення
+    message = callback.message
+    try:
+        if message.text != text or message.reply_markup != keyboard:
+            await message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        logging.error(f"Failed to edit message: {e}")
+    if answer_text is not False:
+        await callback.answer(answer_text)
 
 @dp.callback_query()
 async def handle_callback_query(callback: types.CallbackQuery):
     chat_id = callback.message.chat.id
-    data = callback.data
-    current_text = callback.message.text
+    data = callback.data or ""
     logging.info(f"Callback received: chat_id={chat_id}, data={data}")
 
-    if data.startswith("lang:"):
-        language = data.split(":")[1]
-        user_state[chat_id] = {"stage": "main_menu", "language": language}
-        new_text = (
-            "📍 Головне меню\n"
-            "✅ Мову вибрано!\n"
-            "📝 Почати квіз — створюй картки зі слів\n"
-            "📊 Статистика — твій прогрес\n"
-            "🌐 Змінити мову — вибери іншу мову\n"
-            "ℹ️ Довідка — інформація про бота"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=get_main_menu_inline_keyboard()
-                )
-            await callback.answer()
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer()
-
-    elif data == "start_quiz":
-        user_state[chat_id]["stage"] = "waiting_for_text"
-        new_text = (
-            "📍 Введення тексту\n"
-            "📝 Надішли текст або посилання для аналізу:\n"
-            "Або обери Випадковий текст для квіза з випадкової статті"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-            await callback.answer()
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer()
-
-    elif data == "view_stats":
-        total_words, correct_answers = get_user_stats(chat_id)
-        new_text = (
-            "📍 Статистика\n"
-            f"Твій прогрес:\n"
-            f"Вивчено слів: {total_words}\n"
-            f"Правильних відповідей: {correct_answers}"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-                    ])
-                )
-            await callback.answer("📊 Статистика оновлена!")
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer("📊 Статистика оновлена!")
+    name, _, argument = data.partition(":")
+    handler = callback_routes.get(name)
+    if handler is None:
+        logging.warning(f"Unknown callback: {data}")
+        await callback.answer()
+        return
+    await handler(callback, chat_id, argument)
+
+@callback_route("lang")
+async def on_language_selected(callback, chat_id, language):
+    if language not in SUPPORTED_LANGUAGES:
+        language = DEFAULT_LANGUAGE
+    await sessions.set(chat_id, {"stage": "main_menu", "language": language})
+    await show_screen(callback, *screens.LANGUAGE_SELECTED)
+
+async def set_stage(chat_id, stage):
+    if stage != "waiting_for_text":
+        # Користувач пішов з екрана введення тексту, тож незавершений аналіз уже не потрібен.
+        # Чекаємо, поки задача позначить своє повідомлення скасованим, щоб воно не перезаписало новий екран
+        if analysis_jobs.cancel(chat_id):
+            await analysis_jobs.wait(chat_id)
+    state = await sessions.get(chat_id)
+    state["stage"] = stage
+    await sessions.set(chat_id, state)
+
+@callback_route("start_quiz")
+async def on_start_quiz(callback, chat_id, argument):
+    await set_stage(chat_id, "waiting_for_text")
+    await show_screen(callback, *screens.TEXT_INPUT)
+
+@callback_route("new_text")
+async def on_new_text(callback, chat_id, argument):
+    await set_stage(chat_id, "waiting_for_text")
+    await show_screen(callback, *screens.NEW_TEXT_INPUT)
+
+@callback_route("view_stats")
+async def on_view_stats(callback, chat_id, argument):
+    total_words, correct_answers = await get_progress(chat_id)
+    await show_screen(callback, *screens.stats_screen(total_words, correct_answers), answer_text="📊 Статистика оновлена!")
+
+@callback_route("change_language")
+async def on_change_language(callback, chat_id, argument):
+    await set_stage(chat_id, "choose_language")
+    await show_screen(callback, *screens.CHOOSE_LANGUAGE)
+
+@callback_route("main_menu")
+async def on_main_menu(callback, chat_id, argument):
+    await set_stage(chat_id, "main_menu")
+    await show_screen(callback, *screens.MAIN_MENU)
+
+@callback_route("cancel_analysis")
+async def on_cancel_analysis(callback, chat_id, argument):
+    # Повідомлення з прогресом редагує сама задача, тож тут лише відповідаємо на натискання
+    if not analysis_jobs.cancel(chat_id):
+        await callback.answer("Аналіз уже завершено")
+        return
+    await analysis_jobs.wait(chat_id)
+    await callback.answer()
 
-    elif data == "change_language":
-        user_state[chat_id]["stage"] = "choose_language"
-        new_text = (
-            "📍 Вибір мови\n"
-            "🌐 Обери мову тексту:"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=get_language_inline_keyboard()
-                )
-            await callback.answer()
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer()
-
-    elif data == "main_menu":
-        user_state[chat_id]["stage"] = "main_menu"
-        new_text = (
-            "📍 Головне меню\n"
-            "🏠 Вибери дію:\n"
-            "📝 Почати квіз — створюй картки зі слів\n"
-            "📊 Статистика — твій прогрес\n"
-            "🌐 Змінити мову — вибери іншу мову\n"
-            "ℹ️ Довідка — інформація про бота"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=get_main_menu_inline_keyboard()
-                )
-            await callback.answer()
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer()
-
-    elif data == "show_help":
-        new_text = (
-            "📍 Довідка\n\n"
-            "👋 Quizzy Cards — це бот для вивчення нових слів!\n"
-            "📚 Я створюю квізи з текстів або посилань, допомагаючи тобі запам’ятовувати ключові слова та їх переклади.\n\n"
-            "Основний функціонал:\n"
-            "• 📝 Почати квіз — введи текст, посилання або обери випадковий текст для квіза.\n"
-            "• 📊 Статистика — переглядай свій прогрес.\n"
-            "• 🌐 Змінити мову — обери мову тексту для квіза.\n\n"
-            "Команди:\n"
-            "• /start — почати роботу з ботом\n"
-            "• /stats — переглянути статистику\n"
-            "• /viewdata — переглянути всіх користувачів (тільки для адміністратора)\n\n"
-            "✨ Надсилай текст або обирай опції у меню, щоб розпочати!"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-                    ])
-                )
-            await callback.answer()
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer()
+@callback_route("show_help")
+async def on_show_help(callback, chat_id, argument):
+    await show_screen(callback, *screens.HELP)
 
-    elif data == "random_text":
-        try:
-            random_page = wikipedia.random(1)
-            page = wikipedia.page(random_page)
-            article_text = page.content
-            page_title = page.title
-            if not article_text or len(article_text) < 50:
-                await callback.message.answer(
-                    "📍 Помилка\n"
-                    "❌ Не вдалося отримати придатний випадковий текст. Спробуй ще раз.",
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-                return
-
-            detected_language = detect(article_text)
-            if detected_language != "en":
-                await callback.message.answer(
-                    "📍 Попередження\n"
-                    "⚠️ Випадковий текст не англійською мовою. Спробуй ще раз.",
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-                return
-
-            words = extract_important_words(article_text)
-            if words:
-                if isinstance(words, dict):
-                    words = words[0]
-                await callback.message.answer(
-                    f"📍 Підготовка квіза\n"
-                    f"✨ Я знайшов ключові слова з випадкової статті \"{page_title}\": {', '.join(words)}.\n"
-                    f"Готовий почати квіз? 🚀"
-                )
-                if len(words) < 5:
-                    await callback.message.answer(
-                        f"📍 Попередження\n"
-                        "⚠️ Знайдено мало слів. Можливо, текст надто короткий.\n"
-                        "Усе одно продовжимо!"
-                    )
-                user_state[chat_id] = {
-                    "stage": "quiz",
-                    "words": words,
-                    "current_word_index": 0,
-                    "attempts": 3,
-                    "total_words": len(words),
-                    "language": user_state.get(chat_id, {}).get("language", "en")
-                }
-                await send_next_word(chat_id)
-            else:
-                await callback.message.answer(
-                    "📍 Помилка\n"
-                    "❌ Не вдалося знайти важливі слова у випадковому тексті. Спробуй ще раз.",
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-        except Exception as e:
-            logging.error(f"Error fetching random text: {e}")
+@callback_route("random_text")
+async def on_random_text(callback, chat_id, argument):
+    language = (await sessions.get(chat_id)).get("language", DEFAULT_LANGUAGE)
+    try:
+        article = await get_pool(language).get()
+        if article:
+            words = article["words"]
+            intro = quiz_intro(f"з випадкової статті \"{article['title']}\"", words)
+            state = {
+                "stage": "quiz",
+                "words": words,
+                "translations": article["translations"],
+                "current_word_index": 0,
+                "attempts": 3,
+                "total_words": len(words),
+                "language": language
+            }
+            await send_next_word(chat_id, state, feedback=intro)
+        else:
             await callback.message.answer(
                 "📍 Помилка\n"
-                "❌ Помилка при отриманні випадкового тексту. Спробуй ще раз.",
+                "❌ Не вдалося отримати придатний випадковий текст. Спробуй ще раз.",
                 reply_markup=get_back_and_main_menu_keyboard()
             )
-        await callback.answer()
+    except NLPBusyError as e:
+        logging.warning(f"NLP pool is busy: {e}")
+        await callback.message.answer(
+            BUSY_TEXT,
+            reply_markup=get_back_and_main_menu_keyboard()
+        )
+    except Exception as e:
+        logging.error(f"Error fetching random text: {e}")
+        await callback.message.answer(
+            "📍 Помилка\n"
+            "❌ Помилка при отриманні випадкового тексту. Спробуй ще раз.",
+            reply_markup=get_back_and_main_menu_keyboard()
+        )
+    await callback.answer()
+
+@callback_route("ready_deck")
+async def on_ready_deck(callback, chat_id, argument):
+    # Колоди зібрані заздалегідь командою manage.py build-decks, тож тут немає ні NLP, ні перекладу
+    language = (await sessions.get(chat_id)).get("language", DEFAULT_LANGUAGE)
+    deck = await get_random_deck(language)
+    if deck is None:
+        await show_screen(callback, *screens.NO_DECKS)
+        return
+    await callback.answer()
+    words = deck["words"]
+    state = {
+        "stage": "quiz",
+        "words": words,
+        "translations": deck["translations"],
+        "current_word_index": 0,
+        "attempts": 3,
+        "total_words": len(words),
+        "language": language
+    }
+    await send_next_word(chat_id, state, feedback=quiz_intro(f"з готової колоди \"{deck['title']}\"", words))
+
+@callback_route("review_due")
+async def on_review_due(callback, chat_id, argument):
+    cards = await get_due_cards(chat_id, limit=REVIEW_QUIZ_SIZE)
+    if not cards:
+        await show_screen(callback, *screens.NOTHING_TO_REVIEW)
+        return
+    await callback.answer()
+    words = [word for word, _ in cards]
+    state = await sessions.get(chat_id)
+    state = {
+        "stage": "quiz",
+        "words": words,
+        "translations": [translation for _, translation in cards],
+        "current_word_index": 0,
+        "attempts": 3,
+        "total_words": len(words),
+        "language": state.get("language", DEFAULT_LANGUAGE)
+    }
+    await send_next_word(
+        chat_id, state,
+        feedback=f"📍 Повторення слів\n🔁 Час повторити {len(words)} слів. Почнімо!"
+    )
 
-    elif data == "repeat_quiz":
-        state = user_state.get(chat_id, {})
-        if state.get("stage") == "finished" and "words" in state:
-            state["stage"] = "quiz"
-            state["current_word_index"] = 0
-            state["attempts"] = 3
-            new_text = (
-                "📍 Квіз\n"
-                "🔄 Починаємо заново!"
-            )
-            try:
-                if current_text != new_text:
-                    await callback.message.edit_text(
-                        new_text
-                    )
-                await send_next_word(chat_id)
-            except TelegramBadRequest as e:
-                logging.error(f"Failed to edit message: {e}")
-                await send_next_word(chat_id)
-        else:
-            new_text = (
-                "📍 Помилка\n"
-                "❌ Немає квіза для повтору!"
-            )
-            try:
-                if current_text != new_text:
-                    await callback.message.edit_text(
-                        new_text,
-                        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                            [InlineKeyboardButton(text="🏠 Головне меню", callback_data="main_menu")]
-                        ])
-                    )
-                await callback.answer()
-            except TelegramBadRequest as e:
-                logging.error(f"Failed to edit message: {e}")
-                await callback.answer()
-        await callback.answer()
+@callback_route("repeat_quiz")
+async def on_repeat_quiz(callback, chat_id, argument):
+    state = await sessions.get(chat_id)
+    if state.get("stage") == "finished" and "words" in state:
+        state["stage"] = "quiz"
+        state["current_word_index"] = 0
+        state["attempts"] = 3
+        await sessions.set(chat_id, state)
+        await show_screen(callback, *screens.REPEAT_STARTED)
+        await send_next_word(chat_id, state)
+    else:
+        await show_screen(callback, *screens.NOTHING_TO_REPEAT)
 
-    elif data == "new_text":
-        user_state[chat_id]["stage"] = "waiting_for_text"
-        new_text = (
-            "📍 Введення тексту\n"
-            "📝 Надішли новий текст або посилання для аналізу:\n"
-            "Або обери Випадковий текст для квіза з випадкової статті"
-        )
-        try:
-            if current_text != new_text:
-                await callback.message.edit_text(
-                    new_text,
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-            await callback.answer()
-        except TelegramBadRequest as e:
-            logging.error(f"Failed to edit message: {e}")
-            await callback.answer()
+@callback_route("viewdata")
+async def on_viewdata(callback, chat_id, argument):
+    if chat_id != ADMIN_ID:
+        await callback.answer("❌ Доступ заборонено!")
+        return
+    direction, _, cursor_id = argument.partition(":")
+    if direction == "next":
+        text, keyboard = await render_users_page(after_id=int(cursor_id))
+    else:
+        text, keyboard = await render_users_page(before_id=int(cursor_id))
+    await show_screen(callback, text, keyboard)
 
 @dp.message()
 async def handle_message(message: types.Message):
     chat_id = message.chat.id
     text = message.text
 
-    if user_state.get(chat_id, {}).get("stage") == "waiting_for_text":
-        if text.startswith("http://") or text.startswith("https://"):
-            article_text = extract_text_from_url(text)
-            if not article_text:
-                await message.answer(
-                    "📍 Введення тексту\n"
-                    "❌ Не вдалося витягти текст із посилання.",
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-                return
-            text_to_analyze = article_text
-        else:
-            text_to_analyze = text
+    state = await sessions.get(chat_id)
 
-        chosen_language = user_state.get(chat_id, {}).get("language", "en")
+    if state.get("stage") == "waiting_for_text":
+        # Аналіз іде у фоні, тож черга чату вільна і кнопки можуть його скасувати
+        language = supported_language(state.get("language", DEFAULT_LANGUAGE))
+        if analysis_jobs.start(chat_id, analyze_text, chat_id, text, language) is None:
+            await message.answer(screens.ANALYSIS_BUSY.text, reply_markup=screens.ANALYSIS_BUSY.keyboard)
+
+    elif state.get("stage") == "quiz":
+        await check_answer(chat_id, state, text)
+
+class AnalysisProgress:
+    # Повідомлення з прогресом аналізу. Етапи показуються у фоні, тож аналіз не чекає на ліміт
+    # editMessageText для чату, а з етапів, що накопичилися за цей час, надсилається лише останній
+    def __init__(self, message):
+        self.message = message
+        self._pending = None
+        self._task = None
+
+    def stage(self, screen):
+        self._pending = screen
+        if self._task is None:
+            self._task = asyncio.create_task(self._send_stages())
+
+    async def _send_stages(self):
         try:
-            detected_language = detect(text_to_analyze)
-            logging.info(f"Detected language: {detected_language}, Chosen language: {chosen_language}")
-            if detected_language != chosen_language:
-                await message.answer(
-                    f"📍 Попередження\n"
-                    f"⚠️ Вибрана мова — {chosen_language.upper()}, але текст здається написаним мовою {detected_language.upper()}.\n"
-                    f"Будь ласка, надішли текст правильною мовою.",
-                    reply_markup=get_back_and_main_menu_keyboard()
-                )
-                return
+            while self._pending is not None:
+                screen, self._pending = self._pending, None
+                await self._edit(*screen)
         except Exception as e:
-            logging.error(f"Language detection failed: {e}")
-            await message.answer(
-                "📍 Помилка\n"
-                "❌ Не вдалося визначити мову тексту.\n"
-                "Будь ласка, спробуй ще раз.",
-                reply_markup=get_back_and_main_menu_keyboard()
-            )
-            return
+            logging.error(f"Failed to show analysis progress: {e}")
+        finally:
+            self._task = None
+
+    async def show(self, text, keyboard=None):
+        # Підсумковий екран замінює ще не надіслані етапи й іде після того, що вже надсилається
+        self._pending = None
+        if self._task is not None:
+            await asyncio.wait([self._task])
+        await self._edit(text, keyboard)
+
+    async def _edit(self, text, keyboard):
+        try:
+            await bot.edit_message_text(text, chat_id=self.message.chat.id, message_id=self.message.message_id, reply_markup=keyboard)
+        except TelegramBadRequest as e:
+            logging.error(f"Failed to edit message: {e}")
 
-        words = extract_important_words(text_to_analyze)
+async def analyze_text(chat_id, text, chosen_language):
+    # Одне повідомлення з прогресом редагується після кожного етапу, а помилки показуються в ньому ж
+    is_url = text.startswith("http://") or text.startswith("https://")
+    stages = ["fetch", "detect", "extract", "translate"] if is_url else ["detect", "extract", "translate"]
+    screen = screens.analysis_progress_screen(stages, stages[0])
+    progress = AnalysisProgress(await bot.send_message(chat_id, screen.text, reply_markup=screen.keyboard))
+    try:
+        return await run_analysis(chat_id, text, chosen_language, progress, stages, is_url)
+    except asyncio.CancelledError:
+        await progress.show(*screens.ANALYSIS_CANCELLED)
+        raise
+    except Exception:
+        # Повідомлення не повинно лишитися на ⏳ з кнопкою скасування.
+        # Саму помилку логує й рахує як failed AnalysisJobs
+        await progress.show(
+            "📍 Помилка\n"
+            "❌ Не вдалося проаналізувати текст.\n"
+            "Будь ласка, спробуй ще раз.",
+            get_back_and_main_menu_keyboard()
+        )
+        raise
 
-        if words:
-            if isinstance(words, dict):
-                words = words[0]
-            await message.answer(
-                f"📍 Підготовка квіза\n"
-                f"✨ Я знайшов ключові слова: {', '.join(words)}.\n"
-                f"Готовий почати квіз? 🚀"
-            )
-            if len(words) < 5:
-                await message.answer(
-                    f"📍 Попередження\n"
-                    "⚠️ Знайдено мало слів. Можливо, текст надто короткий.\n"
-                    "Усе одно продовжимо!"
-                )
-            user_state[chat_id] = {
-                "stage": "quiz",
-                "words": words,
-                "current_word_index": 0,
-                "attempts": 3,
-                "total_words": len(words),
-                "language": user_state.get(chat_id, {}).get("language", "en")
-            }
-            await send_next_word(chat_id)
-        else:
-            await message.answer(
+async def run_analysis(chat_id, text, chosen_language, progress, stages, is_url):
+    def stage_done(next_stage):
+        progress.stage(screens.analysis_progress_screen(stages, next_stage))
+
+    async def fail(reason):
+        await progress.show(f"📍 Помилка\n{reason}", get_back_and_main_menu_keyboard())
+
+    if is_url:
+        text_to_analyze, content_key = await fetch_url_text(text)
+        if not text_to_analyze:
+            await progress.show(
                 "📍 Введення тексту\n"
-                "❌ Не вдалося знайти важливі слова.",
-                reply_markup=get_back_and_main_menu_keyboard()
+                "❌ Не вдалося витягти текст із посилання.",
+                get_back_and_main_menu_keyboard()
             )
+            return
+        stage_done("detect")
+    else:
+        text_to_analyze = text
+        content_key = None
 
-    elif user_state.get(chat_id, {}).get("stage") == "quiz":
-        await check_answer(chat_id, text)
+    try:
+        detected_language = await detect_language_cached(text_to_analyze, content_key)
+        logging.info(f"Detected language: {detected_language}, Chosen language: {chosen_language}")
+        if detected_language != chosen_language:
+            await progress.show(
+                f"📍 Попередження\n"
+                f"⚠️ Вибрана мова — {chosen_language.upper()}, але текст здається написаним мовою {detected_language.upper()}.\n"
+                f"Будь ласка, надішли текст правильною мовою.",
+                get_back_and_main_menu_keyboard()
+            )
+            return
+    except NLPBusyError as e:
+        logging.warning(f"NLP pool is busy: {e}")
+        await progress.show(BUSY_TEXT, get_back_and_main_menu_keyboard())
+        return
+    except Exception as e:
+        logging.error(f"Language detection failed: {e}")
+        await fail("❌ Не вдалося визначити мову тексту.\nБудь ласка, спробуй ще раз.")
+        return
+    stage_done("extract")
+
+    try:
+        words = await extract_words_cached(text_to_analyze, content_key, chosen_language)
+    except NLPBusyError as e:
+        logging.warning(f"NLP pool is busy: {e}")
+        await progress.show(BUSY_TEXT, get_back_and_main_menu_keyboard())
+        return
+    except Exception as e:
+        logging.error(f"Keyword extraction failed: {e}")
+        await fail("❌ Не вдалося проаналізувати текст.\nБудь ласка, спробуй ще раз.")
+        return
 
-async def send_next_word(chat_id):
-    state = user_state[chat_id]
+    if not words:
+        await progress.show(
+            "📍 Введення тексту\n"
+            "❌ Не вдалося знайти важливі слова.",
+            get_back_and_main_menu_keyboard()
+        )
+        return
+    stage_done("translate")
+    translations = await translate_words(words, source_lang=chosen_language)
+
+    # Поки йшов аналіз, користувач міг піти з екрана введення тексту, тоді результат не потрібен
+    async with chat_scheduler.chat(chat_id):
+        state = await sessions.get(chat_id)
+        if state.get("stage") != "waiting_for_text" or supported_language(state.get("language", DEFAULT_LANGUAGE)) != chosen_language:
+            await progress.show(*screens.ANALYSIS_OUTDATED)
+            return False
+        await progress.show(*screens.analysis_progress_screen(stages))
+        state = {
+            "stage": "quiz",
+            "words": words,
+            "translations": translations,
+            "current_word_index": 0,
+            "attempts": 3,
+            "total_words": len(words),
+            "language": chosen_language
+        }
+        await send_next_word(chat_id, state, feedback=quiz_intro("", words))
+
+def quiz_intro(source, words):
+    source = f" {source}" if source else ""
+    text = (
+        f"📍 Підготовка квіза\n"
+        f"✨ Я знайшов ключові слова{source}: {', '.join(words)}.\n"
+        f"Готовий почати квіз? 🚀"
+    )
+    if len(words) < 5:
+        text += (
+            "\n\n📍 Попередження\n"
+            "⚠️ Знайдено мало слів. Можливо, текст надто короткий.\n"
+            "Усе одно продовжимо!"
+        )
+    return text
+
+async def send_next_word(chat_id, state, feedback=None):
+    # Відгук на попередню відповідь їде в тому ж повідомленні, що й наступне слово,
+    # тож кожна відповідь коштує один запит до Telegram
+    prefix = f"{feedback}\n\n" if feedback else ""
     if state["current_word_index"] < len(state["words"]):
         word = state["words"][state["current_word_index"]]
-        translation = translate_word(word)
+        translation = state["translations"][state["current_word_index"]]
+        if translation is None:
+            translation = await get_translation(word, source_lang=state.get("language", DEFAULT_LANGUAGE))
         state["current_translation"] = translation
+        await sessions.set(chat_id, state)
         progress = f"Слово {state['current_word_index'] + 1}/{state['total_words']}"
         await bot.send_message(
             chat_id,
+            f"{prefix}"
             f"📍 Квіз\n"
             f"{progress}\n"
             f"Переклади слово {word} українською:\n"
@@ -425,30 +569,24 @@ async def send_next_word(chat_id):
             reply_markup=get_quiz_menu_keyboard()
         )
     else:
-        await finish_quiz(chat_id)
+        await finish_quiz(chat_id, state, feedback=feedback)
 
-async def check_answer(chat_id, user_answer):
-    state = user_state[chat_id]
+async def check_answer(chat_id, state, user_answer):
     word = state["words"][state["current_word_index"]]
     correct_translation = state["current_translation"]
 
     logging.info(f"Checking answer: user_id={chat_id}, word={word}, answer={user_answer}, correct={correct_translation}")
 
     if user_answer.lower() == correct_translation:
+        quality = srs.answer_quality(True, state["attempts"])
         state["current_word_index"] += 1
         state["attempts"] = 3
-        save_quiz_result(chat_id, word, True)
-        await bot.send_message(
-            chat_id,
-            f"📍 Квіз\n"
-            f"✅ Правильно! 🎉\n"
-            f"Переходимо до наступного слова!",
-            reply_markup=get_quiz_menu_keyboard()
-        )
-        await send_next_word(chat_id)
+        await result_writer.add(chat_id, word, True, quality, correct_translation)
+        await send_next_word(chat_id, state, feedback="✅ Правильно! 🎉")
     else:
         state["attempts"] -= 1
         if state["attempts"] > 0:
+            await sessions.set(chat_id, state)
             progress = f"Слово {state['current_word_index'] + 1}/{state['total_words']}"
             await bot.send_message(
                 chat_id,
@@ -461,22 +599,19 @@ async def check_answer(chat_id, user_answer):
         else:
             state["current_word_index"] += 1
             state["attempts"] = 3
-            save_quiz_result(chat_id, word, False)
-            await bot.send_message(
-                chat_id,
-                f"📍 Квіз\n"
-                f"⏳ Спроби закінчились!\n"
-                f"Правильний переклад: {correct_translation}.",
-                reply_markup=get_quiz_menu_keyboard()
+            await result_writer.add(chat_id, word, False, srs.answer_quality(False), correct_translation)
+            await send_next_word(
+                chat_id, state,
+                feedback=f"⏳ Спроби закінчились!\nПравильний переклад: {correct_translation}."
             )
-            await send_next_word(chat_id)
 
-async def finish_quiz(chat_id):
-    state = user_state[chat_id]
-    total = state["total_words"]
-    total_words, correct_answers = get_user_stats(chat_id)
+async def finish_quiz(chat_id, state, feedback=None):
+    await result_writer.flush()
+    total_words, correct_answers = await get_progress(chat_id)
+    prefix = f"{feedback}\n\n" if feedback else ""
     await bot.send_message(
         chat_id,
+        f"{prefix}"
         f"📍 Результат квіза\n"
         f"🏁 Квіз завершено!\n"
         f"Вивчено слів: {total_words}\n"
@@ -484,33 +619,58 @@ async def finish_quiz(chat_id):
         reply_markup=get_finish_inline_keyboard()
     )
     state["stage"] = "finished"
+    await sessions.set(chat_id, state)
+
+background_tasks = set()
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", "25"))
+
+def _on_update_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Error processing update: {task.exception()}")
 
 @app.route('/webhook', methods=['POST'])
-def webhook():
+async def webhook(request):
     logging.info("Received webhook request")
     try:
         update = types.Update(**request.get_json())
-        loop.run_until_complete(dp.feed_update(bot, update))
-        logging.info("Webhook processed successfully")
-        return '', 200
     except Exception as e:
-        logging.error(f"Error processing webhook: {e}")
-        return '', 500
+        logging.error(f"Invalid webhook payload: {e}")
+        return '', 400
+    # Telegram отримує відповідь одразу, а саме оновлення обробляється у фоновій задачі
+    task = asyncio.create_task(dp.feed_update(bot, update))
+    background_tasks.add(task)
+    task.add_done_callback(_on_update_done)
+    return '', 200
 
 @app.route('/webhook/setwebhook', methods=['GET'])
-def set_webhook_endpoint():
+async def set_webhook_endpoint(request):
     try:
         webhook_url = os.getenv("WEBHOOK_URL")
         if not webhook_url:
             logging.error("WEBHOOK_URL is not set in environment variables")
             return "WEBHOOK_URL is not set in environment variables", 500
-        loop.run_until_complete(bot.set_webhook(webhook_url))
+        await bot.set_webhook(webhook_url)
         logging.info(f"Webhook set to {webhook_url}")
         return {"ok": True, "result": True, "description": "Webhook was set"}, 200
     except Exception as e:
         logging.error(f"Failed to set webhook: {e}")
         return {"ok": False, "description": f"Failed to set webhook: {str(e)}"}, 500
 
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint(request):
+    return metrics.render(), 200, {"content-type": "text/plain; version=0.0.4; charset=utf-8"}
+
+async def send_review_reminder(user_id, count):
+    await bot.send_message(
+        user_id,
+        f"📍 Повторення слів\n"
+        f"🔔 Час повторити слова: {count}. Це займе хвилину!",
+        reply_markup=REVIEW_REMINDER_KEYBOARD
+    )
+
+review_scheduler = ReviewScheduler(send_review_reminder)
+
 async def set_webhook():
     webhook_url = os.getenv("WEBHOOK_URL")
     if not webhook_url:
@@ -518,19 +678,61 @@ async def set_webhook():
     await bot.set_webhook(webhook_url)
     logging.info(f"Webhook set to {webhook_url}")
 
-async def main():
-    logging.info("Starting database initialization...")
-    init_db()
-    logging.info("Database initialization completed.")
+async def on_startup():
+    started = time.perf_counter()
+    # Без попереднього завантаження модель вантажиться паралельно з рештою запуску
+    load_model_in_background()
+    with metrics.startup_phase("init_db"):
+        await init_db()
+    with metrics.startup_phase("result_writer"):
+        await result_writer.start()
+    article_pool.start()
+    review_scheduler.start()
+    maintenance.start()
+    metrics.record_startup_phase("ready", time.perf_counter() - started)
+
+async def on_shutdown():
+    if background_tasks:
+        logging.info(f"Waiting for {len(background_tasks)} updates to finish...")
+        await asyncio.wait(background_tasks, timeout=SHUTDOWN_GRACE)
+    if background_tasks:
+        # Оновлення, що не вклалися в SHUTDOWN_GRACE, зупиняються до закриття ресурсів, якими вони користуються
+        logging.warning(f"Cancelling {len(background_tasks)} updates that did not finish in time")
+        remaining = list(background_tasks)
+        for task in remaining:
+            task.cancel()
+        await asyncio.gather(*remaining, return_exceptions=True)
+    await analysis_jobs.stop()
+    await review_scheduler.stop()
+    await maintenance.stop()
+    await stop_article_pools()
+    shutdown_nlp_pool()
+    await close_session()
+    await sessions.close()
+    await result_writer.stop()
+    await close_pool()
+    await bot.session.close()
+
+app.on_startup.append(on_startup)
+app.on_shutdown.append(on_shutdown)
 
+async def main():
     if IS_LOCAL:
+        await on_startup()
         logging.info("Running in local mode with polling...")
         await bot.delete_webhook(drop_pending_updates=True)
         logging.info("Webhook deleted, starting polling...")
-        await dp.start_polling(bot)
+        try:
+            await dp.start_polling(bot)
+        finally:
+            await on_shutdown()
     else:
+        # Оновлення обробляє ASGI-застосунок під gunicorn, тут лише реєструємо вебхук
         logging.info("Running in production mode with webhook...")
-        await set_webhook()
+        try:
+            await set_webhook()
+        finally:
+            await bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
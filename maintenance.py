@@ -0,0 +1,51 @@
+import os
+import asyncio
+import logging
+import database
+
+MAINTENANCE_INTERVAL = float(os.getenv("MAINTENANCE_INTERVAL", str(6 * 3600)))
+
+
+async def rollup():
+    # Разом зі згортанням старих відповідей створює секції на наступні місяці,
+    # тож нові рядки не осідають у quiz_results_default між релізами
+    await database.rollup_quiz_results()
+
+
+class MaintenanceScheduler:
+    # Раз на MAINTENANCE_INTERVAL виконує обслуговування БД. Кожен воркер має свій планувальник,
+    # а одночасні rollup різних воркерів серіалізує advisory lock у rollup_quiz_results
+    def __init__(self, tasks, interval=MAINTENANCE_INTERVAL):
+        self.tasks = tasks
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    async def run_once(self):
+        for task in self.tasks:
+            try:
+                await task()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Maintenance task {task.__name__} failed: {e}")
+
+
+maintenance = MaintenanceScheduler([rollup])
@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import database
+import http_client
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def reconcile_stats(args):
+    await database.init_db()
+    try:
+        drifted = await database.reconcile_user_stats(args.user_id)
+        print(f"Users with drifted counters: {drifted}")
+    finally:
+        await database.close_pool()
+
+
+async def migrate(args):
+    # init_db застосовує всі міграції, яких ще немає в schema_migrations
+    await database.init_db()
+    await database.close_pool()
+
+
+async def rollup(args):
+    await database.init_db()
+    try:
+        compacted, dropped = await database.rollup_quiz_results(args.retention_days)
+        print(f"Rolled up answers: {compacted}, partitions dropped: {dropped}")
+    finally:
+        await database.close_pool()
+
+
+async def build_decks(args):
+    from deck_builder import build_decks as run_build
+
+    await database.init_db()
+    try:
+        saved = await run_build(
+            args.path, workers=args.workers, chunk_size=args.chunk_size,
+            language=args.language, target_lang=args.target_lang
+        )
+        print(f"Decks built: {saved}")
+    finally:
+        await http_client.close_session()
+        await database.close_pool()
+
+
+async def build_dictionary(args):
+    from translation_backends import build_dictionary as run_build
+
+    count = await asyncio.to_thread(run_build, args.source, args.destination)
+    print(f"Dictionary entries: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quizzy Cards maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reconcile = commands.add_parser("reconcile-stats", help="Backfill and verify the user_stats counters")
+    reconcile.add_argument("--user-id", type=int, help="Only reconcile this user")
+    reconcile.set_defaults(handler=reconcile_stats)
+
+    commands.add_parser("migrate", help="Apply pending schema migrations").set_defaults(handler=migrate)
+
+    rollup_parser = commands.add_parser("rollup", help="Compact old quiz results into daily aggregates")
+    rollup_parser.add_argument(
+        "--retention-days", type=int, default=database.QUIZ_RESULTS_RETENTION_DAYS,
+        help="Keep individual answers for this many days"
+    )
+    rollup_parser.set_defaults(handler=rollup)
+
+    decks = commands.add_parser("build-decks", help="Build ready-made quiz decks from a text corpus")
+    decks.add_argument("path", help="Directory of .txt files or a JSONL file with title and text fields")
+    decks.add_argument("--workers", type=int, help="NLP processes (defaults to the CPU count)")
+    decks.add_argument("--chunk-size", type=int, default=32, help="Texts per nlp.pipe batch")
+    decks.add_argument("--language", default="en", help="Language of the corpus")
+    decks.add_argument("--target-lang", default="uk", help="Language to translate the words into")
+    decks.set_defaults(handler=build_decks)
+
+    dictionary = commands.add_parser("build-dictionary", help="Sort a word<TAB>translation file for offline lookups")
+    dictionary.add_argument("source", help="TSV file with a word and its translation on each line")
+    dictionary.add_argument("destination", help="Output file to point TRANSLATION_DICTIONARY at")
+    dictionary.set_defaults(handler=build_dictionary)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import time
+import bisect
+import logging
+import functools
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+SLOW_UPDATE_SECONDS = float(os.getenv("SLOW_UPDATE_SECONDS", "2"))
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+_update_stages = ContextVar("update_stages", default=None)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), callback=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def set(self, *labels, value):
+        self._values[labels] = value
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self):
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            self._values = {labels if isinstance(labels, tuple) else (labels,): value for labels, value in values.items()}
+        return super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, *labels, value):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _format_labels(self.labels, labels, ("le", bound)), cumulative
+            yield f"{self.name}_bucket", _format_labels(self.labels, labels, ("le", "+Inf")), count
+            yield f"{self.name}_sum", _format_labels(self.labels, labels), total
+            yield f"{self.name}_count", _format_labels(self.labels, labels), count
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_LATENCY = Histogram("quizzy_stage_duration_seconds", "Latency of external and CPU-heavy calls", ["stage"])
+STAGE_ERRORS = Counter("quizzy_stage_errors_total", "Failed external and CPU-heavy calls", ["stage"])
+STAGE_IN_FLIGHT = Gauge("quizzy_stage_in_flight", "Calls currently in progress", ["stage"])
+UPDATE_LATENCY = Histogram("quizzy_update_duration_seconds", "Time to process one Telegram update", ["type"])
+SLOW_UPDATES = Counter("quizzy_slow_updates_total", "Updates slower than SLOW_UPDATE_SECONDS", ["type"])
+STARTUP_PHASES = Gauge("quizzy_startup_phase_seconds", "Duration of each startup phase of this process", ["phase"])
+
+
+@contextmanager
+def track(stage):
+    STAGE_IN_FLIGHT.inc(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_IN_FLIGHT.dec(stage)
+        STAGE_LATENCY.observe(stage, value=elapsed)
+        stages = _update_stages.get()
+        if stages is not None:
+            stages.append((stage, elapsed))
+
+
+@contextmanager
+def startup_phase(phase):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup_phase(phase, time.perf_counter() - started)
+
+
+def record_startup_phase(phase, elapsed):
+    STARTUP_PHASES.set(phase, value=round(elapsed, 3))
+    logging.info(f"Startup phase {phase} took {elapsed:.3f}s")
+
+
+def timed(stage):
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with track(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def track_update(update_type, update_id):
+    # Збираємо етапи одного оновлення, щоб у лозі повільних оновлень було видно, куди пішов час
+    stages = []
+    token = _update_stages.set(stages)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _update_stages.reset(token)
+        UPDATE_LATENCY.observe(update_type, value=elapsed)
+        if elapsed >= SLOW_UPDATE_SECONDS:
+            SLOW_UPDATES.inc(update_type)
+            breakdown = {}
+            for stage, stage_elapsed in stages:
+                breakdown[stage] = breakdown.get(stage, 0.0) + stage_elapsed
+            details = ", ".join(
+                f"{stage}={stage_elapsed:.3f}s"
+                for stage, stage_elapsed in sorted(breakdown.items(), key=lambda item: -item[1])
+            )
+            logging.warning(f"Slow update {update_id} ({update_type}) took {elapsed:.3f}s: {details or 'no tracked stages'}")
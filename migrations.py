@@ -0,0 +1,286 @@
+import os
+import logging
+from datetime import datetime
+
+# Номер advisory-блокування, під яким у Postgres виконується лише один прогін міграцій
+MIGRATION_LOCK_ID = 7215001
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+PARTITION_PREFIX = "quiz_results_p"
+
+
+def _initial_schema(c, dialect):
+    logging.info("Creating table 'users' if it does not exist...")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    logging.info("Creating table 'quiz_results' if it does not exist...")
+    id_column = "id INTEGER PRIMARY KEY AUTOINCREMENT" if dialect == "sqlite" else "id SERIAL PRIMARY KEY"
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS quiz_results (
+            {id_column},
+            user_id BIGINT REFERENCES users(user_id),
+            word TEXT NOT NULL,
+            is_correct BOOLEAN NOT NULL,
+            answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    logging.info("Creating table 'user_stats' if it does not exist...")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+            total_answers BIGINT NOT NULL DEFAULT 0,
+            correct_answers BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_quiz_results_user_id ON quiz_results (user_id)')
+
+    logging.info("Creating table 'review_cards' if it does not exist...")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS review_cards (
+            user_id BIGINT NOT NULL REFERENCES users(user_id),
+            word TEXT NOT NULL,
+            translation TEXT,
+            ease REAL NOT NULL DEFAULT 2.5,
+            interval_days REAL NOT NULL DEFAULT 0,
+            repetitions INTEGER NOT NULL DEFAULT 0,
+            due_at TIMESTAMP NOT NULL,
+            reminded BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (user_id, word)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_review_cards_user_due ON review_cards (user_id, due_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_review_cards_pending_reminders ON review_cards (due_at) WHERE reminded = FALSE')
+
+    logging.info("Creating table 'translations' if it does not exist...")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS translations (
+            word TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (word, target_lang)
+        )
+    ''')
+
+
+    logging.info("Creating table 'decks' if it does not exist...")
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS decks (
+            {id_column},
+            source_key TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            language TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            words TEXT NOT NULL,
+            translations TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_decks_language ON decks (language, target_lang, id)')
+
+    logging.info("Creating table 'sessions' if it does not exist...")
+    blob_type = "BLOB" if dialect == "sqlite" else "BYTEA"
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS sessions (
+            chat_id BIGINT PRIMARY KEY,
+            data {blob_type} NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def list_partitions(c, table="quiz_results"):
+    # Місячні секції та межа, до якої вони зберігають рядки
+    c.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE parent.relname = %s',
+        (table,)
+    )
+    partitions = {}
+    for (name,) in c.fetchall():
+        if name.startswith(PARTITION_PREFIX):
+            month = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m")
+            partitions[name] = _next_month(month)
+    return partitions
+
+
+def ensure_partitions(c, since=None, table="quiz_results", months_ahead=PARTITION_MONTHS_AHEAD):
+    # Створює місячні секції від since (або поточного місяця) на months_ahead місяців уперед.
+    # Місяць, рядки якого вже потрапили в секцію за замовчуванням, пропускається: Postgres не дасть його виділити
+    last = _month_start(datetime.utcnow())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    month = _month_start(since or datetime.utcnow())
+    existing = list_partitions(c, table)
+    created = 0
+    while month <= last:
+        name = f"{PARTITION_PREFIX}{month:%Y%m}"
+        upper = _next_month(month)
+        if name not in existing:
+            c.execute(
+                'SELECT 1 FROM quiz_results_default WHERE answered_at >= %s AND answered_at < %s LIMIT 1',
+                (month, upper)
+            )
+            if c.fetchone():
+                logging.warning(f"Rows for {month:%Y-%m} are already in quiz_results_default, not creating {name}")
+            else:
+                c.execute(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+                )
+                created += 1
+        month = upper
+    return created
+
+
+def _partition_quiz_results(c, dialect):
+    if dialect == "sqlite":
+        # SQLite не вміє секціонувати таблиці, тож лише індексуємо час відповіді для rollup
+        c.execute('CREATE INDEX IF NOT EXISTS idx_quiz_results_answered_at ON quiz_results (answered_at)')
+        return
+    # Нова секціонована таблиця заповнюється зі старої й займає її ім'я
+    c.execute('''
+        CREATE TABLE quiz_results_partitioned (
+            id BIGSERIAL,
+            user_id BIGINT REFERENCES users(user_id),
+            word TEXT NOT NULL,
+            is_correct BOOLEAN NOT NULL,
+            answered_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, answered_at)
+        ) PARTITION BY RANGE (answered_at)
+    ''')
+    c.execute('CREATE TABLE quiz_results_default PARTITION OF quiz_results_partitioned DEFAULT')
+    # Старі воркери під час релізу ще пишуть відповіді: блокування тримає їхні INSERT до кінця міграції,
+    # інакше рядки, додані після знімка INSERT ... SELECT, зникли б разом зі старою таблицею
+    c.execute('LOCK TABLE quiz_results IN EXCLUSIVE MODE')
+    c.execute('SELECT MIN(answered_at) FROM quiz_results')
+    ensure_partitions(c, c.fetchone()[0], table="quiz_results_partitioned")
+    c.execute('''
+        INSERT INTO quiz_results_partitioned (id, user_id, word, is_correct, answered_at)
+        SELECT id, user_id, word, is_correct, COALESCE(answered_at, CURRENT_TIMESTAMP) FROM quiz_results
+    ''')
+    c.execute(
+        "SELECT setval(pg_get_serial_sequence('quiz_results_partitioned', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+        "FROM quiz_results_partitioned"
+    )
+    c.execute('DROP TABLE quiz_results')
+    c.execute('ALTER TABLE quiz_results_partitioned RENAME TO quiz_results')
+    c.execute('ALTER TABLE quiz_results RENAME CONSTRAINT quiz_results_partitioned_pkey TO quiz_results_pkey')
+    c.execute('CREATE INDEX idx_quiz_results_user_id ON quiz_results (user_id)')
+    # BRIN на часі відповіді: рядки додаються в порядку часу, тож індекс займає кілька сторінок на секцію
+    c.execute('CREATE INDEX idx_quiz_results_answered_at ON quiz_results USING BRIN (answered_at)')
+
+
+def _daily_rollups(c, dialect):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_results_daily (
+            user_id BIGINT NOT NULL REFERENCES users(user_id),
+            word TEXT NOT NULL,
+            day DATE NOT NULL,
+            total INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day, word)
+        )
+    ''')
+
+
+def _translation_source_language(c, dialect):
+    # Досі бот перекладав лише англійські тексти, тож наявні переклади позначаються як en
+    if dialect == "postgres":
+        # Як і для quiz_results: переклади, збережені під час копіювання, не повинні загубитися
+        c.execute('LOCK TABLE translations IN EXCLUSIVE MODE')
+    c.execute('''
+        CREATE TABLE translations_by_source (
+            word TEXT NOT NULL,
+            source_lang TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (word, source_lang, target_lang)
+        )
+    ''')
+    c.execute('''
+        INSERT INTO translations_by_source (word, source_lang, target_lang, translation, updated_at)
+        SELECT word, 'en', target_lang, translation, updated_at FROM translations
+    ''')
+    c.execute('DROP TABLE translations')
+    c.execute('ALTER TABLE translations_by_source RENAME TO translations')
+    if dialect == "postgres":
+        c.execute('ALTER TABLE translations RENAME CONSTRAINT translations_by_source_pkey TO translations_pkey')
+
+
+def stats_totals_sql(user_filter="TRUE"):
+    # Лічильники користувачів з відповідей; старі відповіді вже згорнуті в quiz_results_daily
+    return f'''
+        SELECT user_id, SUM(total) AS total, SUM(correct) AS correct FROM (
+            SELECT user_id, COUNT(*) AS total, SUM(CASE WHEN is_correct THEN 1 ELSE 0 END) AS correct
+            FROM quiz_results WHERE {user_filter} GROUP BY user_id
+            UNION ALL
+            SELECT user_id, SUM(total), SUM(correct) FROM quiz_results_daily WHERE {user_filter} GROUP BY user_id
+        ) answers GROUP BY user_id
+    '''
+
+
+def _backfill_user_stats(c, dialect):
+    # На базі, що існувала до user_stats, таблицю було створено порожньою, і /stats показував нулі
+    if dialect == "postgres":
+        c.execute('LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE')
+    c.execute(f'''
+        INSERT INTO user_stats (user_id, total_answers, correct_answers)
+        SELECT user_id, total, correct FROM ({stats_totals_sql()}) r WHERE TRUE
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_answers = EXCLUDED.total_answers,
+            correct_answers = EXCLUDED.correct_answers,
+            updated_at = CURRENT_TIMESTAMP
+    ''')
+
+
+# Кожна міграція застосовується один раз і записується в schema_migrations.
+# Нові міграції додаються лише в кінець списку
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "partition quiz_results by month", _partition_quiz_results),
+    (3, "daily quiz_results rollups", _daily_rollups),
+    (4, "source language for translations", _translation_source_language),
+    (5, "backfill user_stats", _backfill_user_stats),
+]
+
+
+def migrate(c, dialect):
+    if dialect == "postgres":
+        # Блокування транзакції: інші воркери чекають тут, доки перший не закомітить міграції
+        c.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('SELECT version FROM schema_migrations')
+    applied = {row[0] for row in c.fetchall()}
+    pending = [migration for migration in MIGRATIONS if migration[0] not in applied]
+    for version, name, apply in pending:
+        logging.info(f"Applying migration {version}: {name}")
+        apply(c, dialect)
+        c.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (version, name))
+    if dialect == "postgres":
+        ensure_partitions(c)
+    return len(pending)
@@ -0,0 +1,144 @@
+import gc
+import os
+import importlib.util
+import time
+import asyncio
+import logging
+import resource
+from collections import OrderedDict
+from metrics import startup_phase
+
+DEFAULT_LANGUAGE = "en"
+MODEL_NAME = os.getenv("SPACY_MODEL", "en_core_web_sm")
+LANGUAGE_MODELS = {
+    "en": MODEL_NAME,
+    "de": "de_core_news_sm",
+    "fr": "fr_core_news_sm",
+    "es": "es_core_news_sm",
+}
+# SPACY_MODELS="it:it_core_news_sm,de:de_core_news_md" додає мови або замінює їхні моделі
+for _entry in filter(None, os.getenv("SPACY_MODELS", "").split(",")):
+    _language, _, _name = _entry.partition(":")
+    LANGUAGE_MODELS[_language.strip()] = _name.strip()
+
+
+def _model_installed(name):
+    # Моделі spaCy — звичайні пакети Python, тож їх видно без імпорту самого spaCy
+    return os.path.isdir(name) or importlib.util.find_spec(name) is not None
+
+
+# Мови без встановленої моделі не пропонуються; основна мова доступна завжди
+SUPPORTED_LANGUAGES = tuple(
+    language for language, name in LANGUAGE_MODELS.items()
+    if language == DEFAULT_LANGUAGE or _model_installed(name)
+)
+for _language in LANGUAGE_MODELS:
+    if _language not in SUPPORTED_LANGUAGES:
+        logging.warning(f"spaCy model {LANGUAGE_MODELS[_language]} is not installed, '{_language}' is disabled")
+
+# Орієнтовна пам'ять усіх завантажених моделей процесу; найдавніше використані вивантажуються
+NLP_MEMORY_BUDGET_MB = float(os.getenv("NLP_MEMORY_BUDGET_MB", "1024"))
+# Фільтру за частинами мови потрібні лише tagger/morphologizer і attribute_ruler
+EXCLUDED_COMPONENTS = ["parser", "ner", "lemmatizer"]
+WARMUP_TEXT = "The quick brown fox jumps over the lazy dog."
+
+_pipelines = OrderedDict()
+_loading = None
+MODEL_INFO = {}
+
+
+class UnsupportedLanguage(ValueError):
+    pass
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        # ru_maxrss — це пікове значення, але краще, ніж нічого
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _evict(keep):
+    # Розмір моделі — приріст RSS під час її завантаження; остання завантажена модель лишається завжди
+    while len(_pipelines) > 1 and sum(MODEL_INFO[language]["rss_delta_mb"] for language in _pipelines) > NLP_MEMORY_BUDGET_MB:
+        language = next(iter(_pipelines))
+        if language == keep:
+            break
+        del _pipelines[language]
+        MODEL_INFO[language]["loaded"] = False
+        MODEL_INFO[language]["evictions"] += 1
+        logging.info(f"Evicted spaCy model {MODEL_INFO[language]['name']} to stay within {NLP_MEMORY_BUDGET_MB:.0f} MB")
+    gc.collect()
+
+
+def load_model(language=DEFAULT_LANGUAGE):
+    nlp = _pipelines.get(language)
+    if nlp is not None:
+        _pipelines.move_to_end(language)
+        return nlp
+    if language not in SUPPORTED_LANGUAGES:
+        raise UnsupportedLanguage(f"No spaCy model installed for '{language}'")
+    name = LANGUAGE_MODELS[language]
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    # spaCy імпортується тут, а не на рівні модуля: сам імпорт займає секунди і потрібен лише з моделлю
+    import spacy
+    nlp = spacy.load(name, exclude=EXCLUDED_COMPONENTS)
+    nlp(WARMUP_TEXT)
+    load_time = time.perf_counter() - started
+    rss_after = current_rss_mb()
+    info = MODEL_INFO.setdefault(language, {"evictions": 0})
+    info.update({
+        "name": name,
+        "pipeline": list(nlp.pipe_names),
+        "load_time_s": round(load_time, 3),
+        "rss_mb": round(rss_after, 1),
+        "rss_delta_mb": round(max(rss_after - rss_before, 0.0), 1),
+        "loaded": True,
+    })
+    logging.info(
+        f"Loaded spaCy model {name} {nlp.pipe_names} in {load_time:.2f}s, "
+        f"RSS {rss_after:.1f} MB (+{rss_after - rss_before:.1f} MB)"
+    )
+    _pipelines[language] = nlp
+    _evict(keep=language)
+    return nlp
+
+
+def model_stats():
+    return {language: dict(info) for language, info in MODEL_INFO.items()}
+
+
+async def _load_in_background():
+    try:
+        with startup_phase("load_model"):
+            await asyncio.to_thread(load_model)
+    except Exception as e:
+        logging.error(f"Background model load failed, NLP workers will load it themselves: {e}")
+
+
+def load_model_in_background():
+    # Бот починає відповідати одразу, а модель тим часом вантажиться в окремому потоці
+    global _loading
+    if DEFAULT_LANGUAGE not in _pipelines and _loading is None:
+        _loading = asyncio.create_task(_load_in_background())
+    return _loading
+
+
+async def wait_for_model():
+    # Воркери пулу створюються через fork: якщо дочекатися моделі, вони успадкують її копію,
+    # а не вантажитимуть свою, і fork не відбудеться посеред імпорту в іншому потоці
+    if _loading is not None and not _loading.done():
+        await asyncio.shield(_loading)
+
+
+def supported_language(language):
+    # Сесія могла зберегти мову, модель якої потім прибрали
+    return language if language in SUPPORTED_LANGUAGES else DEFAULT_LANGUAGE
+
+
+def get_nlp(language=DEFAULT_LANGUAGE):
+    return load_model(language)
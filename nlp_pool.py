@@ -0,0 +1,162 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import language
+import metrics
+from metrics import timed
+from nlp_models import DEFAULT_LANGUAGE, load_model, model_stats, wait_for_model
+from text_analyzer import extract_important_words_batch
+
+NLP_WORKERS = int(os.getenv("NLP_WORKERS", "2"))
+NLP_QUEUE_LIMIT = int(os.getenv("NLP_QUEUE_LIMIT", "32"))
+NLP_TIMEOUT = float(os.getenv("NLP_TIMEOUT", "30"))
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "8"))
+NLP_BATCH_WINDOW = float(os.getenv("NLP_BATCH_WINDOW_MS", "20")) / 1000
+
+
+class NLPBusyError(Exception):
+    pass
+
+
+_executor = None
+_pending = 0
+# Пачки збираються окремо для кожної мови, щоб одна пачка йшла через одну модель
+_batches = {}
+_batch_timers = {}
+# Останній звіт кожного воркера про завантажені в нього моделі
+_worker_models = {}
+
+
+def _init_worker():
+    load_model()
+
+
+def _extract(texts, lang):
+    return extract_important_words_batch(texts, lang), os.getpid(), model_stats()
+
+
+def _worker_model_stat(field):
+    return {
+        (str(pid), lang): info[field]
+        for pid, stats in _worker_models.items()
+        for lang, info in stats.items()
+        if info.get("loaded")
+    }
+
+
+metrics.Gauge(
+    "quizzy_nlp_model_memory_mb", "Estimated memory of each spaCy model loaded in an NLP worker",
+    ["worker", "language"], callback=lambda: _worker_model_stat("rss_delta_mb")
+)
+metrics.Gauge(
+    "quizzy_nlp_model_load_seconds", "How long each loaded spaCy model took to load",
+    ["worker", "language"], callback=lambda: _worker_model_stat("load_time_s")
+)
+
+
+def _detect(chunks):
+    return language.detect_sample(chunks)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        logging.info(f"Starting NLP pool with {NLP_WORKERS} workers")
+        _executor = ProcessPoolExecutor(max_workers=NLP_WORKERS, initializer=_init_worker)
+    return _executor
+
+
+def pending():
+    return _pending
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _worker_models.clear()
+
+
+async def _in_pool(fn, *args):
+    global _executor
+    loop = asyncio.get_running_loop()
+    if _executor is None:
+        await wait_for_model()
+    try:
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    except BrokenProcessPool:
+        logging.error("NLP worker died, restarting the pool")
+        _executor = None
+        _worker_models.clear()
+        raise
+
+
+async def _run_batch(lang, items):
+    texts = [text for text, _ in items]
+    try:
+        results, pid, stats = await _in_pool(_extract, texts, lang)
+        _worker_models[pid] = stats
+    except Exception as e:
+        for _, future in items:
+            if not future.done():
+                future.set_exception(e)
+        return
+    for (_, future), words in zip(items, results):
+        if not future.done():
+            future.set_result(words)
+
+
+def _flush_batch(lang):
+    timer = _batch_timers.pop(lang, None)
+    if timer is not None:
+        timer.cancel()
+    # Запити, які вже скасували (наприклад, разом із фоновим аналізом), у воркер не йдуть
+    items = [item for item in _batches.pop(lang, []) if not item[1].done()]
+    if items:
+        asyncio.get_running_loop().create_task(_run_batch(lang, items))
+
+
+async def _submit(make_future):
+    global _pending
+    if _pending >= NLP_QUEUE_LIMIT:
+        raise NLPBusyError(f"NLP queue is full ({_pending} jobs)")
+    _pending += 1
+    try:
+        return await asyncio.wait_for(make_future(), NLP_TIMEOUT)
+    finally:
+        _pending -= 1
+
+
+@timed("extract_important_words")
+async def extract_words(text, lang=DEFAULT_LANGUAGE):
+    # Запити, що прийшли майже одночасно, проходять через nlp.pipe однією пачкою
+    def make_future():
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = _batches.setdefault(lang, [])
+        batch.append((text, future))
+        if len(batch) >= NLP_BATCH_SIZE:
+            _flush_batch(lang)
+        elif lang not in _batch_timers:
+            _batch_timers[lang] = loop.call_later(NLP_BATCH_WINDOW, _flush_batch, lang)
+        return future
+
+    return await _submit(make_future)
+
+
+@timed("detect")
+async def detect_language_with_confidence(text):
+    # Кеш живе в основному процесі, а у воркер відправляємо лише вибірку
+    chunks = language.sample_chunks(text)
+    key, result = language.cached(chunks)
+    if result is None:
+        result = await _submit(lambda: _in_pool(_detect, chunks))
+        language.remember(key, result)
+    return result
+
+
+async def detect_language(text):
+    return (await detect_language_with_confidence(text))[0]
@@ -0,0 +1,190 @@
+import os
+import json
+import glob
+import fcntl
+import asyncio
+import logging
+from datetime import datetime
+import database
+
+RESULT_FLUSH_SIZE = int(os.getenv("RESULT_FLUSH_SIZE", "100"))
+RESULT_FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", "2"))
+RESULT_SPILL_DIR = os.getenv("RESULT_SPILL_DIR", "spill")
+RESULT_SPILL_FSYNC = os.getenv("RESULT_SPILL_FSYNC", "false").lower() == "true"
+# Після стількох невдалих записів поспіль пачка перевіряється частинами, щоб знайти биті рядки
+RESULT_MAX_FAILURES = int(os.getenv("RESULT_MAX_FAILURES", "3"))
+
+
+def _write_events(f, events, fsync):
+    for user_id, word, is_correct, answered_at, quality, translation in events:
+        line = [user_id, word, is_correct, answered_at.isoformat(), quality, translation]
+        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    f.flush()
+    if fsync:
+        os.fsync(f.fileno())
+
+
+class ResultWriter:
+    # Відповіді накопичуються в пам'яті й записуються в БД пачками.
+    # Кожна подія спершу дописується у spill-файл, тож після падіння процесу
+    # наступний запуск дочитає й збереже все, що не встигло потрапити в БД.
+    def __init__(self, flush_size=RESULT_FLUSH_SIZE, flush_interval=RESULT_FLUSH_INTERVAL, spill_dir=RESULT_SPILL_DIR):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.spill_dir = spill_dir
+        self._buffer = []
+        self._inflight = []
+        self._flush_lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._failures = 0
+        self._task = None
+        self._flushes = set()
+        self._spill = None
+        self._spill_path = None
+
+    async def start(self):
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill_path = os.path.join(self.spill_dir, f"results-{os.getpid()}.spill")
+            self._spill = open(self._spill_path, "a", encoding="utf-8")
+            fcntl.flock(self._spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._recover_orphans()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._periodic_flush())
+        if self._buffer:
+            logging.info(f"Recovered {len(self._buffer)} unsaved quiz results from spill files")
+            await self.flush()
+
+    def _recover_orphans(self):
+        for path in glob.glob(os.path.join(self.spill_dir, "*.spill")):
+            if path == self._spill_path:
+                continue
+            try:
+                f = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    # Файл живого воркера заблокований, його не чіпаємо
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                # Інший воркер міг забрати цей файл, поки ми чекали на блокування
+                if os.fstat(f.fileno()).st_nlink == 0:
+                    continue
+                events = []
+                for line in f:
+                    try:
+                        user_id, word, is_correct, answered_at, *extra = json.loads(line)
+                    except ValueError:
+                        continue
+                    quality, translation = (extra + [None, None])[:2]
+                    events.append((user_id, word, is_correct, datetime.fromisoformat(answered_at), quality, translation))
+                # Події спершу потрапляють у власний spill-файл, і лише потім чужий файл видаляється
+                self._write_spill(events, fsync=True)
+                self._buffer.extend(events)
+                os.remove(path)
+
+    def _write_spill(self, events, fsync=RESULT_SPILL_FSYNC):
+        if self._spill is not None:
+            _write_events(self._spill, events, fsync)
+
+    def _rewrite_spill(self):
+        # Новий вміст пишеться поруч і атомарно підміняє spill-файл, тож падіння посеред запису
+        # лишає на диску або старий файл, або новий повністю. Блокування ставиться до підміни,
+        # щоб інший воркер не прийняв файл за покинутий
+        if self._spill is None:
+            return
+        tmp_path = self._spill_path + ".tmp"
+        spill = open(tmp_path, "w", encoding="utf-8")
+        try:
+            fcntl.flock(spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            _write_events(spill, self._buffer, fsync=True)
+            os.replace(tmp_path, self._spill_path)
+        except BaseException:
+            spill.close()
+            raise
+        self._spill.close()
+        self._spill = spill
+
+    async def add(self, user_id, word, is_correct, quality=None, translation=None):
+        event = (user_id, word, is_correct, datetime.utcnow(), quality, translation)
+        self._write_spill([event])
+        self._buffer.append(event)
+        if len(self._buffer) >= self.flush_size and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    def pending_stats(self, user_id):
+        total = correct = 0
+        for event_user_id, _, is_correct, *_ in self._inflight + self._buffer:
+            if event_user_id == user_id:
+                total += 1
+                correct += 1 if is_correct else 0
+        return total, correct
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            self._inflight, self._buffer = self._buffer, []
+            try:
+                if self._failures >= RESULT_MAX_FAILURES:
+                    await self._save_isolated(list(self._inflight))
+                else:
+                    await database.save_quiz_results(self._inflight)
+            except BaseException as e:
+                # Навіть при скасуванні пачка повертається в буфер, а spill-файл лишається як був
+                self._buffer = self._inflight + self._buffer
+                self._inflight = []
+                if not isinstance(e, Exception):
+                    raise
+                self._failures += 1
+                logging.warning(f"Keeping {len(self._buffer)} quiz results buffered until the next flush")
+                return
+            self._inflight = []
+            self._failures = 0
+            # Spill-файл переписується лише після підтвердженого запису
+            self._rewrite_spill()
+
+    async def _save_isolated(self, events):
+        # Пачка ділиться навпіл, доки биті рядки не залишаться поодинці; їх відкидаємо,
+        # а будь-яка інша помилка (наприклад, БД недоступна) зупиняє перевірку
+        # Частини обробляються по порядку, тож збережене чи відкинуте завжди на початку _inflight
+        try:
+            await database.save_quiz_results(events)
+        except database.DATA_ERRORS as e:
+            if len(events) > 1:
+                middle = len(events) // 2
+                first, second = events[:middle], events[middle:]
+                await self._save_isolated(first)
+                await self._save_isolated(second)
+                return
+            logging.error(f"Dropping quiz result that cannot be saved: {events[0]!r}: {e}")
+        del self._inflight[:len(events)]
+
+    async def _periodic_flush(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    async def stop(self):
+        # Періодичний запис не скасовується посеред пачки, а завершується сам
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            if not self._buffer:
+                os.remove(self._spill_path)
+
+
+result_writer = ResultWriter()
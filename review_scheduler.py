@@ -0,0 +1,65 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+import database
+
+REVIEW_CHECK_INTERVAL = float(os.getenv("REVIEW_CHECK_INTERVAL", "300"))
+REVIEW_REMINDERS_PER_SECOND = float(os.getenv("REVIEW_REMINDERS_PER_SECOND", "20"))
+# Користувачі позначаються нагаданими ще до надсилання, тож пачка — це приблизно секунда надсилань:
+# при зупинці поточна пачка дописується, а незабраних користувачів наступний запуск знайде сам
+REVIEW_BATCH_SIZE = int(os.getenv("REVIEW_BATCH_SIZE", str(max(1, int(REVIEW_REMINDERS_PER_SECOND)))))
+
+
+class ReviewScheduler:
+    # Раз на REVIEW_CHECK_INTERVAL забирає пачками користувачів, у яких настав час повторення,
+    # і надсилає їм нагадування з обмеженням швидкості
+    def __init__(self, send_reminder, interval=REVIEW_CHECK_INTERVAL, batch_size=REVIEW_BATCH_SIZE,
+                 per_second=REVIEW_REMINDERS_PER_SECOND):
+        self.send_reminder = send_reminder
+        self.interval = interval
+        self.batch_size = batch_size
+        self.per_second = per_second
+        self._stopping = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        # Не скасовуємо задачу посеред пачки: уже забрані користувачі мають отримати нагадування
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f"Review scheduler failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self):
+        now = datetime.utcnow()
+        sent = 0
+        while not self._stopping.is_set():
+            due = await database.claim_due_reminders(now, self.batch_size)
+            if not due:
+                break
+            for user_id, count in due.items():
+                try:
+                    await self.send_reminder(user_id, count)
+                    sent += 1
+                except Exception as e:
+                    logging.warning(f"Failed to send review reminder to {user_id}: {e}")
+                await asyncio.sleep(1 / self.per_second)
+        if sent:
+            logging.info(f"Sent {sent} review reminders")
+        return sent
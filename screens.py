@@ -0,0 +1,138 @@
+from collections import namedtuple
+from keyboards import ANALYSIS_KEYBOARD, LANGUAGE_KEYBOARD, MAIN_MENU_KEYBOARD, TEXT_INPUT_KEYBOARD, BACK_TO_MENU_KEYBOARD
+
+Screen = namedtuple("Screen", ["text", "keyboard"])
+
+LANGUAGE_SELECTED = Screen(
+    "📍 Головне меню\n"
+    "✅ Мову вибрано!\n"
+    "📝 Почати квіз — створюй картки зі слів\n"
+    "🔁 Повторення слів — слова, які час повторити\n"
+    "📊 Статистика — твій прогрес\n"
+    "🌐 Змінити мову — вибери іншу мову\n"
+    "ℹ️ Довідка — інформація про бота",
+    MAIN_MENU_KEYBOARD
+)
+
+MAIN_MENU = Screen(
+    "📍 Головне меню\n"
+    "🏠 Вибери дію:\n"
+    "📝 Почати квіз — створюй картки зі слів\n"
+    "🔁 Повторення слів — слова, які час повторити\n"
+    "📊 Статистика — твій прогрес\n"
+    "🌐 Змінити мову — вибери іншу мову\n"
+    "ℹ️ Довідка — інформація про бота",
+    MAIN_MENU_KEYBOARD
+)
+
+TEXT_INPUT = Screen(
+    "📍 Введення тексту\n"
+    "📝 Надішли текст або посилання для аналізу:\n"
+    "Або обери Випадковий текст для квіза з випадкової статті",
+    TEXT_INPUT_KEYBOARD
+)
+
+NEW_TEXT_INPUT = Screen(
+    "📍 Введення тексту\n"
+    "📝 Надішли новий текст або посилання для аналізу:\n"
+    "Або обери Випадковий текст для квіза з випадкової статті",
+    TEXT_INPUT_KEYBOARD
+)
+
+CHOOSE_LANGUAGE = Screen(
+    "📍 Вибір мови\n"
+    "🌐 Обери мову тексту:",
+    LANGUAGE_KEYBOARD
+)
+
+HELP = Screen(
+    "📍 Довідка\n\n"
+    "👋 Quizzy Cards — це бот для вивчення нових слів!\n"
+    "📚 Я створюю квізи з текстів або посилань, допомагаючи тобі запам’ятовувати ключові слова та їх переклади.\n\n"
+    "Основний функціонал:\n"
+    "• 📝 Почати квіз — введи текст, посилання, обери випадковий текст або готову колоду для квіза.\n"
+    "• 🔁 Повторення слів — квіз зі слів, які час повторити за методом інтервальних повторень.\n"
+    "• 📊 Статистика — переглядай свій прогрес.\n"
+    "• 🌐 Змінити мову — обери мову тексту для квіза.\n\n"
+    "Команди:\n"
+    "• /start — почати роботу з ботом\n"
+    "• /stats — переглянути статистику\n"
+    "• /viewdata — переглянути всіх користувачів (тільки для адміністратора)\n"
+    "• /export — вивантажити дані у файл (тільки для адміністратора)\n\n"
+    "✨ Надсилай текст або обирай опції у меню, щоб розпочати!",
+    BACK_TO_MENU_KEYBOARD
+)
+
+NO_DECKS = Screen(
+    "📍 Готові колоди\n"
+    "🗂 Готових колод для цієї мови ще немає. Надішли текст або обери випадковий.",
+    TEXT_INPUT_KEYBOARD
+)
+
+ANALYSIS_BUSY = Screen(
+    "📍 Аналіз тексту\n"
+    "⏳ Я ще аналізую попередній текст. Дочекайся результату або скасуй аналіз кнопкою під ним.",
+    BACK_TO_MENU_KEYBOARD
+)
+
+ANALYSIS_CANCELLED = Screen(
+    "📍 Аналіз тексту\n"
+    "✖️ Аналіз скасовано. Надішли інший текст або посилання.",
+    TEXT_INPUT_KEYBOARD
+)
+
+ANALYSIS_OUTDATED = Screen(
+    "📍 Аналіз тексту\n"
+    "✖️ Аналіз зупинено, бо ти вже перейшов до іншого екрана.",
+    None
+)
+
+# Етапи аналізу в порядку виконання; fetch буває лише для посилань
+ANALYSIS_STAGES = {
+    "fetch": "Завантажую сторінку",
+    "detect": "Визначаю мову",
+    "extract": "Шукаю ключові слова",
+    "translate": "Перекладаю слова",
+}
+
+
+def analysis_progress_screen(stages, current=None):
+    # Один екран, який редагується після кожного етапу; без current усі етапи завершені
+    position = stages.index(current) if current else len(stages)
+    lines = [
+        f"{'✅' if index < position else '⏳' if index == position else '▫️'} {ANALYSIS_STAGES[stage]}"
+        for index, stage in enumerate(stages)
+    ]
+    return Screen(
+        "📍 Аналіз тексту\n" + "\n".join(lines),
+        ANALYSIS_KEYBOARD if current else None
+    )
+
+
+NOTHING_TO_REVIEW = Screen(
+    "📍 Повторення слів\n"
+    "✅ Зараз немає слів для повторення. Я нагадаю, коли настане час!",
+    BACK_TO_MENU_KEYBOARD
+)
+
+REPEAT_STARTED = Screen(
+    "📍 Квіз\n"
+    "🔄 Починаємо заново!",
+    None
+)
+
+NOTHING_TO_REPEAT = Screen(
+    "📍 Помилка\n"
+    "❌ Немає квіза для повтору!",
+    BACK_TO_MENU_KEYBOARD
+)
+
+
+def stats_screen(total_words, correct_answers):
+    return Screen(
+        "📍 Статистика\n"
+        f"Твій прогрес:\n"
+        f"Вивчено слів: {total_words}\n"
+        f"Правильних відповідей: {correct_answers}",
+        BACK_TO_MENU_KEYBOARD
+    )
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import zlib
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import urlparse
+import database
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", str(7 * 24 * 3600)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+COMPRESS_THRESHOLD = 512
+
+# Короткі ключі роблять серіалізований стан у кілька разів меншим
+_SHORT_KEYS = {
+    "stage": "s",
+    "language": "l",
+    "words": "w",
+    "translations": "t",
+    "current_word_index": "i",
+    "attempts": "a",
+    "total_words": "n",
+    "current_translation": "c",
+}
+_LONG_KEYS = {short: long for long, short in _SHORT_KEYS.items()}
+
+
+def dumps(state):
+    compact = {_SHORT_KEYS.get(key, key): value for key, value in state.items()}
+    data = json.dumps(compact, ensure_ascii=False, separators=(",", ":")).encode()
+    if len(data) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(data)
+    return b"j" + data
+
+
+def loads(data):
+    if not data:
+        return {}
+    data = bytes(data)
+    payload = zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+    return {_LONG_KEYS.get(key, key): value for key, value in json.loads(payload).items()}
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    async def get(self, chat_id):
+        pass
+
+    @abstractmethod
+    async def set(self, chat_id, state):
+        pass
+
+    @abstractmethod
+    async def delete(self, chat_id):
+        pass
+
+    async def purge(self):
+        # Видаляє сесії, що простояли довше idle_ttl; повертає кількість видалених
+        return 0
+
+    async def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES, idle_ttl=SESSION_IDLE_TTL):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._data = OrderedDict()
+
+    async def get(self, chat_id):
+        item = self._data.get(chat_id)
+        if item is None:
+            return {}
+        data, touched_at = item
+        if time.monotonic() - touched_at > self.idle_ttl:
+            del self._data[chat_id]
+            return {}
+        self._data.move_to_end(chat_id)
+        return loads(data)
+
+    async def set(self, chat_id, state):
+        self._data[chat_id] = (dumps(state), time.monotonic())
+        self._data.move_to_end(chat_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, chat_id):
+        self._data.pop(chat_id, None)
+
+    async def purge(self):
+        # Записи впорядковані за часом останнього звернення, тож прострочені йдуть першими
+        deadline = time.monotonic() - self.idle_ttl
+        purged = 0
+        while self._data and next(iter(self._data.values()))[1] < deadline:
+            self._data.popitem(last=False)
+            purged += 1
+        return purged
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLSessionStore(SessionStore):
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+
+    async def get(self, chat_id):
+        return loads(await database.load_session(chat_id, self.idle_ttl))
+
+    async def set(self, chat_id, state):
+        await database.save_session(chat_id, dumps(state))
+
+    async def delete(self, chat_id):
+        await database.delete_session(chat_id)
+
+    async def purge(self):
+        return await database.purge_sessions(self.idle_ttl)
+
+
+class RedisSessionStore(SessionStore):
+    # Достатньо GET/SET/DEL, тож говоримо RESP напряму без окремого клієнта
+    def __init__(self, url=REDIS_URL, idle_ttl=SESSION_IDLE_TTL, prefix="quizzy:session:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._send("AUTH", self.password)
+        if self.db:
+            await self._send("SELECT", self.db)
+
+    async def _send(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(f"${len(arg)}\r\n".encode() + arg + b"\r\n")
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind in (b"+", b":"):
+            return rest
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {rest.decode()}")
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    async def _command(self, *args):
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._send(*args)
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    self._drop()
+                    if attempt:
+                        raise
+                except BaseException:
+                    # Скасування чи помилка посеред команди лишають непрочитану відповідь у сокеті,
+                    # тож наступна команда прочитала б чужу відповідь
+                    self._drop()
+                    raise
+
+    def _drop(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def get(self, chat_id):
+        return loads(await self._command("GET", f"{self.prefix}{chat_id}"))
+
+    async def set(self, chat_id, state):
+        await self._command("SET", f"{self.prefix}{chat_id}", dumps(state), "EX", self.idle_ttl)
+
+    async def delete(self, chat_id):
+        await self._command("DEL", f"{self.prefix}{chat_id}")
+
+    async def close(self):
+        self._drop()
+
+
+STORES = {
+    "memory": MemorySessionStore,
+    "sql": SQLSessionStore,
+    "redis": RedisSessionStore,
+}
+
+
+def create_store(backend=SESSION_BACKEND):
+    store_cls = STORES.get(backend)
+    if store_cls is None:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    logging.info(f"Using {backend} session store")
+    return store_cls()
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+# SM-2: https://super-memory.com/english/ol/sm2.htm
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_ATTEMPTS = 3
+
+
+def answer_quality(is_correct, attempts_left=None):
+    # 5 — з першої спроби, 4 — з другої, 3 — з останньої, 1 — так і не вгадав
+    if not is_correct:
+        return 1
+    if attempts_left is None:
+        return 4
+    return max(3, 5 - (MAX_ATTEMPTS - attempts_left))
+
+
+def schedule(ease, interval_days, repetitions, quality, now):
+    if quality < 3:
+        repetitions = 0
+        interval_days = 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = 1
+        elif repetitions == 2:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * ease, 2)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return round(ease, 3), interval_days, repetitions, now + timedelta(days=interval_days)
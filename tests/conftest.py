@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модулі бота лежать у корені репозиторію, як і для benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
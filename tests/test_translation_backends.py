@@ -0,0 +1,27 @@
+import asyncio
+from translation_backends import DictionaryBackend, build_dictionary
+
+
+def test_capitalized_translation_is_lowercased(tmp_path):
+    source = tmp_path / "source.tsv"
+    source.write_text("Cat\tКіт\nDog\tсобака\n", encoding="utf-8")
+    destination = tmp_path / "dictionary.tsv"
+    assert build_dictionary(source, destination) == 2
+
+    backend = DictionaryBackend(destination, "en", "uk")
+    try:
+        assert backend.lookup("cat") == "кіт"
+        assert backend.lookup("CAT") == "кіт"
+        assert asyncio.run(backend.translate_many(["Cat", "dog", "bird"], "en", "uk")) == {"Cat": "кіт", "dog": "собака"}
+    finally:
+        backend.close()
+
+
+def test_lookup_lowercases_dictionaries_built_before_the_fix(tmp_path):
+    path = tmp_path / "dictionary.tsv"
+    path.write_bytes("cat\tКіт\n".encode("utf-8"))
+    backend = DictionaryBackend(path, "en", "uk")
+    try:
+        assert backend.lookup("cat") == "кіт"
+    finally:
+        backend.close()
@@ -1,19 +1,21 @@
-import spacy
-import requests
-from bs4 import BeautifulSoup
+from metrics import timed
+from nlp_models import DEFAULT_LANGUAGE, get_nlp
 
-def extract_text_from_url(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        text = ' '.join(p.get_text() for p in soup.find_all('p'))
-        return text
-    except requests.RequestException:
-        return None
+def paragraph_text(html):
+    from bs4 import BeautifulSoup
 
-def extract_important_words(text):
-    nlp = spacy.load("en_core_web_sm")
-    doc = nlp(text)
+    soup = BeautifulSoup(html, 'html.parser')
+    return ' '.join(p.get_text() for p in soup.find_all('p'))
+
+def select_important_words(doc):
     words = [token.text.lower() for token in doc if token.pos_ in ["NOUN", "ADJ", "VERB"] and not token.is_stop and token.is_alpha]
-    return list(dict.fromkeys(words))[:10]
\ No newline at end of file
+    return list(dict.fromkeys(words))[:10]
+
+@timed("extract_important_words")
+def extract_important_words(text, language=DEFAULT_LANGUAGE):
+    nlp = get_nlp(language)
+    return select_important_words(nlp(text))
+
+def extract_important_words_batch(texts, language=DEFAULT_LANGUAGE):
+    nlp = get_nlp(language)
+    return [select_important_words(doc) for doc in nlp.pipe(texts)]
@@ -0,0 +1,190 @@
+import os
+import mmap
+import asyncio
+import logging
+import metrics
+from database import get_translations, save_translations
+from utils import translate_batch_async, translate_word_async
+
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "10"))
+TRANSLATION_BATCH_CHARS = int(os.getenv("TRANSLATION_BATCH_CHARS", "1500"))
+TRANSLATION_DICTIONARY = os.getenv("TRANSLATION_DICTIONARY")
+TRANSLATION_DICTIONARY_LANG = os.getenv("TRANSLATION_DICTIONARY_LANG", "uk")
+TRANSLATION_DICTIONARY_SOURCE = os.getenv("TRANSLATION_DICTIONARY_SOURCE", "en")
+
+TRANSLATIONS = metrics.Counter("quizzy_translations_total", "Words translated by each backend", ["backend"])
+
+
+class GoogleBackend:
+    # Слова групуються в запити до TRANSLATION_BATCH_CHARS символів, щоб URL лишався коротким
+    name = "google"
+
+    def __init__(self, batch_chars=TRANSLATION_BATCH_CHARS, concurrency=TRANSLATION_CONCURRENCY):
+        self.batch_chars = batch_chars
+        self.concurrency = concurrency
+        self._semaphore = None
+
+    def _batches(self, words):
+        batch, size = [], 0
+        for word in words:
+            if batch and size + len(word) + 1 > self.batch_chars:
+                yield batch
+                batch, size = [], 0
+            batch.append(word)
+            size += len(word) + 1
+        if batch:
+            yield batch
+
+    async def _translate_batch(self, batch, source_lang, target_lang):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            try:
+                return await translate_batch_async(batch, target_lang, source_lang)
+            except Exception as e:
+                logging.warning(f"Batch translation of {len(batch)} words failed, falling back to single words: {e!r}")
+        return await asyncio.gather(*(self._translate_word(word, source_lang, target_lang) for word in batch))
+
+    async def _translate_word(self, word, source_lang, target_lang):
+        async with self._semaphore:
+            return await translate_word_async(word, target_lang, source_lang)
+
+    async def translate_many(self, words, source_lang, target_lang):
+        batches = list(self._batches(words))
+        translated = await asyncio.gather(
+            *(self._translate_batch(batch, source_lang, target_lang) for batch in batches)
+        )
+        return {
+            word: translation
+            for batch, translations in zip(batches, translated)
+            for word, translation in zip(batch, translations)
+            if translation
+        }
+
+
+class DictionaryBackend:
+    # Відсортований за словом TSV "слово\tпереклад", відображений у пам'ять.
+    # Пошук — бінарний по байтових зсувах, тож файл не читається цілком і спільний між процесами
+    name = "dictionary"
+
+    def __init__(self, path, source_lang, target_lang):
+        self.path = path
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self._file = open(path, "rb")
+        # Порожній файл не можна відобразити в пам'ять
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def lookup(self, word):
+        key = word.lower().encode("utf-8") + b"\t"
+        data = self._map
+        low, high = 0, len(data)
+        while low < high:
+            middle = (low + high) // 2
+            start = data.rfind(b"\n", 0, middle) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            if data[start:end] < key:
+                low = end + 1
+            else:
+                high = start
+        end = data.find(b"\n", low)
+        line = data[low:end if end != -1 else len(data)]
+        if not line.startswith(key):
+            return None
+        # Відповіді порівнюються в нижньому регістрі, як і переклади Google; старі словники могли зберегти великі літери
+        return line[len(key):].decode("utf-8").strip().lower() or None
+
+    async def translate_many(self, words, source_lang, target_lang):
+        if (source_lang, target_lang) != (self.source_lang, self.target_lang):
+            return {}
+        found = {}
+        for word in words:
+            translation = self.lookup(word)
+            if translation:
+                found[word] = translation
+        return found
+
+    def close(self):
+        if self._map:
+            self._map.close()
+        self._file.close()
+
+
+class DatabaseBackend:
+    # Таблиця translations як кеш перед мережею: ChainBackend зберігає сюди знайдене далі по ланцюжку
+    name = "database"
+
+    async def translate_many(self, words, source_lang, target_lang):
+        try:
+            return await get_translations(words, target_lang, source_lang)
+        except Exception:
+            return {}
+
+    async def store(self, translations, source_lang, target_lang):
+        try:
+            await save_translations(translations, target_lang, source_lang)
+        except Exception:
+            logging.warning("Translations were not persisted, keeping them in memory only")
+
+
+class ChainBackend:
+    # Кожен наступний бекенд отримує лише слова, яких не знайшли попередні,
+    # а знайдене записується в попередні бекенди, що вміють зберігати
+    name = "chain"
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    async def translate_many(self, words, source_lang, target_lang):
+        found = {}
+        missing = list(words)
+        for position, backend in enumerate(self.backends):
+            if not missing:
+                break
+            translated = await backend.translate_many(missing, source_lang, target_lang)
+            if not translated:
+                continue
+            TRANSLATIONS.inc(backend.name, amount=len(translated))
+            for previous in self.backends[:position]:
+                if hasattr(previous, "store"):
+                    await previous.store(translated, source_lang, target_lang)
+            found.update(translated)
+            missing = [word for word in missing if word not in translated]
+        return found
+
+
+def build_dictionary(source, destination):
+    # Приводить довільний TSV до формату DictionaryBackend: слова й переклади в нижньому регістрі,
+    # перший переклад виграє, рядки відсортовані за байтами UTF-8
+    entries = {}
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            word, separator, translation = line.rstrip("\n").partition("\t")
+            word, translation = word.strip().lower(), translation.strip().lower()
+            if separator and word and translation:
+                entries.setdefault(word, translation)
+    lines = sorted(f"{word}\t{translation}\n".encode("utf-8") for word, translation in entries.items())
+    with open(destination, "wb") as f:
+        f.writelines(lines)
+    return len(lines)
+
+
+def create_backend():
+    # Офлайн-словник -> таблиця translations -> Google
+    backends = []
+    if TRANSLATION_DICTIONARY:
+        if os.path.exists(TRANSLATION_DICTIONARY):
+            logging.info(
+                f"Using offline dictionary {TRANSLATION_DICTIONARY} "
+                f"for {TRANSLATION_DICTIONARY_SOURCE}->{TRANSLATION_DICTIONARY_LANG}"
+            )
+            backends.append(DictionaryBackend(
+                TRANSLATION_DICTIONARY, TRANSLATION_DICTIONARY_SOURCE, TRANSLATION_DICTIONARY_LANG
+            ))
+        else:
+            logging.warning(f"Translation dictionary {TRANSLATION_DICTIONARY} not found, using online translation only")
+    backends.append(DatabaseBackend())
+    backends.append(GoogleBackend())
+    return ChainBackend(backends)
@@ -0,0 +1,63 @@
+import os
+import time
+from collections import OrderedDict
+from nlp_models import DEFAULT_LANGUAGE
+from translation_backends import create_backend
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "10000"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", str(24 * 3600)))
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+_cache = TTLCache(TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL)
+_backend = create_backend()
+
+
+async def translate_words(words, target_lang="uk", source_lang=DEFAULT_LANGUAGE):
+    # Пам'ять -> ланцюжок бекендів (офлайн-словник, таблиця translations, Google пакетами).
+    # Мова джерела входить у ключ: однакове написання в різних мовах має різні переклади
+    result = {}
+    missing = []
+    for word in dict.fromkeys(words):
+        cached = _cache.get((word, source_lang, target_lang))
+        if cached is not None:
+            result[word] = cached
+        else:
+            missing.append(word)
+
+    if missing:
+        for word, translation in (await _backend.translate_many(missing, source_lang, target_lang)).items():
+            result[word] = translation
+            _cache.set((word, source_lang, target_lang), translation)
+
+    return [result.get(word) for word in words]
+
+
+async def get_translation(word, target_lang="uk", source_lang=DEFAULT_LANGUAGE):
+    return (await translate_words([word], target_lang, source_lang))[0]
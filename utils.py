@@ -1,21 +1,44 @@
-import requests
+import os
+import logging
+from http_client import fetch
+from metrics import timed
 
 
-GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+GOOGLE_TRANSLATE_URL = os.getenv("GOOGLE_TRANSLATE_URL", "https://translate.googleapis.com/translate_a/single")
 
 
-def translate_word(word, target_lang="uk"):
-    params = {
+def _translate_params(word, target_lang, source_lang="auto"):
+    return {
         "client": "gtx",
-        "sl": "auto",
+        "sl": source_lang,
         "tl": target_lang,
         "dt": "t",
         "q": word
     }
+
+
+@timed("translate_word")
+async def translate_word_async(word, target_lang="uk", source_lang="auto"):
+    params = _translate_params(word, target_lang, source_lang)
     try:
-        response = requests.get(GOOGLE_TRANSLATE_URL, params=params)
-        if response.status_code == 200:
+        response = await fetch(GOOGLE_TRANSLATE_URL, params=params)
+        if response.status == 200:
             return response.json()[0][0][0].lower()
         return None
-    except Exception:
-        return None
\ No newline at end of file
+    except Exception as e:
+        logging.warning(f"Translation of {word!r} failed: {e!r}")
+        return None
+
+
+@timed("translate_batch")
+async def translate_batch_async(words, target_lang="uk", source_lang="auto"):
+    # Слова йдуть одним запитом, по одному в рядку; Google повертає переклад кожного рядка окремим сегментом
+    params = _translate_params("\n".join(words), target_lang, source_lang)
+    response = await fetch(GOOGLE_TRANSLATE_URL, params=params)
+    if response.status != 200:
+        raise ValueError(f"Translation request returned {response.status}")
+    text = "".join(segment[0] for segment in response.json()[0] if segment[0])
+    lines = text.split("\n")
+    if len(lines) != len(words):
+        raise ValueError(f"Expected {len(words)} translated lines, got {len(lines)}")
+    return [line.strip().lower() or None for line in lines]
@@ -0,0 +1,109 @@
+import json
+import logging
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query_string = scope.get("query_string", b"").decode()
+        self.headers = {k.decode().lower(): v.decode() for k, v in scope.get("headers", [])}
+        self.body = body
+
+    def get_json(self):
+        return json.loads(self.body or b"null")
+
+
+class ASGIApp:
+    # Мінімальний ASGI-застосунок із Flask-подібними маршрутами, щоб не тягнути окремий фреймворк
+    def __init__(self):
+        self.routes = {}
+        self.on_startup = []
+        self.on_shutdown = []
+
+    def route(self, path, methods=("GET",)):
+        def decorator(handler):
+            for method in methods:
+                self.routes[(method.upper(), path)] = handler
+            return handler
+        return decorator
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for handler in self.on_startup:
+                        await handler()
+                except Exception as e:
+                    logging.exception("Application startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    for handler in self.on_shutdown:
+                        await handler()
+                except Exception as e:
+                    logging.exception("Application shutdown failed")
+                    await send({"type": "lifespan.shutdown.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def _http(self, scope, receive, send):
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is None:
+            allowed = any(path == scope["path"] for _, path in self.routes)
+            await self._respond(send, "", 405 if allowed else 404)
+            return
+        body = await self._read_body(receive)
+        if body is None:
+            await self._respond(send, "", 413)
+            return
+        try:
+            result = await handler(Request(scope, body))
+        except Exception:
+            logging.exception(f"Unhandled error in {scope['path']}")
+            result = ("", 500)
+        await self._respond(send, *result)
+
+    async def _respond(self, send, body, status=200, headers=None):
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers.setdefault("content-type", "application/json")
+        elif isinstance(body, str):
+            body = body.encode()
+            headers.setdefault("content-type", "text/plain; charset=utf-8")
+        headers["content-length"] = str(len(body))
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        })
+        await send({"type": "http.response.body", "body": body})